@@ -0,0 +1,262 @@
+import math
+import logging
+import threading
+from itertools import islice
+from contextlib import contextmanager
+from collections.abc import Iterator
+
+import numpy as np
+import pandas as pd
+
+from django.conf import settings
+from django.db.models import Sum
+from django.db.models.functions import Coalesce
+
+from .models import Voter, VoterCount
+
+logger = logging.getLogger(__name__)
+
+UNIQUE_COLUMNS = ['email', 'matriculation_number']
+SEED_CHUNK_SIZE = 50_000  # keys fetched per round trip while seeding
+BLOOM_HASH_KEYS = ('dj-voters-bloom1', 'dj-voters-bloom2')  # pandas wants 16 byte keys
+
+
+class KeySet:
+    """The exact set of keys seen so far, for rosters that comfortably fit in memory."""
+
+    exact = True
+
+    def __init__(self):
+        self._keys = set()
+
+    def add(self, values: np.ndarray):
+        self._keys.update(values.tolist())
+
+    def contains(self, values: np.ndarray) -> np.ndarray:
+        keys = self._keys
+        return np.fromiter((value in keys for value in values.tolist()), dtype=bool, count=len(values))
+
+
+class IndexLookup:
+    """
+    The keys of one column, looked up in the voters table for every chunk instead of being loaded.
+
+    Each chunk costs one ``IN`` query on the column's unique index, so small uploads don't
+    pay for reading every existing voter first. Keys of inserted voters are in the table
+    already, so nothing needs to be remembered.
+    """
+
+    exact = True
+
+    def __init__(self, column: str):
+        self.column = column
+
+    def add(self, values: np.ndarray):
+        pass
+
+    def contains(self, values: np.ndarray) -> np.ndarray:
+        values = values.tolist()
+        existing = set(Voter.objects.filter(**{f'{self.column}__in': values}).values_list(self.column, flat=True))
+        return np.fromiter((value in existing for value in values), dtype=bool, count=len(values))
+
+
+class BloomFilter:
+    """
+    A Bloom filter over string keys, backed by a NumPy bit array.
+
+    Membership is approximate: ``contains`` never misses a key that was added, but reports
+    about ``error_rate`` of the other keys as present too.
+
+    Args:
+        capacity (int): Number of keys the filter is sized for.
+        error_rate (float): The false positive rate at ``capacity`` keys.
+    """
+
+    exact = False
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        self.hash_count = max(round(self.size / capacity * math.log(2)), 1)
+        self._bits = np.zeros((self.size + 7) // 8, dtype=np.uint8)
+
+    def _positions(self, values: np.ndarray) -> np.ndarray:
+        # double hashing: the i-th position is h1 + i * h2
+        first, second = (pd.util.hash_array(values.astype(object), hash_key=key) for key in BLOOM_HASH_KEYS)
+        steps = np.arange(self.hash_count, dtype=np.uint64)
+        return (first[:, None] + steps * second[:, None]) % np.uint64(self.size)
+
+    def add(self, values: np.ndarray):
+        positions = self._positions(values).ravel()
+        masks = np.left_shift(np.uint8(1), (positions & np.uint64(7)).astype(np.uint8))
+        np.bitwise_or.at(self._bits, positions >> np.uint64(3), masks)
+
+    def contains(self, values: np.ndarray) -> np.ndarray:
+        positions = self._positions(values)
+        bits = self._bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8) & 1
+        return bits.all(axis=1)
+
+
+class DuplicateFilter:
+    """
+    Drop the voters of a chunk that can't be inserted before they reach the database.
+
+    A voter is dropped when its email or matriculation number is already taken by a voter
+    in the database or by an earlier row of the upload, exactly the rows the unique indexes
+    would reject. ``for_upload`` picks how the taken keys are found: uploads much smaller
+    than the voters table (by ``DEDUPE_LOOKUP_COST``) look up the keys of each chunk
+    (``from_lookups``), others load the keys of every existing voter once with a single
+    streamed query (``from_database``) and add the keys of every chunk once it is saved.
+
+    Loaded rosters of up to ``DEDUPE_BLOOM_THRESHOLD`` voters are kept as exact sets. Larger
+    ones are kept in Bloom filters, and the rows they flag are confirmed against the database
+    so that a false positive never drops a new voter. The database stays the final arbiter
+    for rows inserted concurrently, e.g. by other shards of the same upload.
+    """
+
+    def __init__(self, key_sets: dict):
+        self.key_sets = key_sets
+
+    @classmethod
+    def for_upload(cls, expected_rows: int) -> 'DuplicateFilter':
+        """
+        Build the filter suited to an upload of ``expected_rows`` rows, see the class docstring.
+
+        The existing voters are counted from the ``VoterCount`` summary, which is cheap
+        whatever the size of the voters table.
+        """
+        existing = VoterCount.objects.aggregate(total=Coalesce(Sum('count'), 0))['total']
+        if expected_rows * settings.VOTER_UPLOAD['DEDUPE_LOOKUP_COST'] < existing:
+            return cls.from_lookups()
+        return cls.from_database(expected_rows=expected_rows)
+
+    @classmethod
+    def from_lookups(cls) -> 'DuplicateFilter':
+        """A filter that looks up the keys of each chunk in the database, without loading anything."""
+        return cls({column: IndexLookup(column) for column in UNIQUE_COLUMNS})
+
+    @classmethod
+    def from_database(cls, expected_rows: int = 0) -> 'DuplicateFilter':
+        """
+        Seed a filter with the keys of every existing voter.
+
+        Args:
+            expected_rows (int): Rows the upload is expected to add, to size Bloom filters.
+        """
+        existing = Voter.objects.count()
+        exact = existing <= settings.VOTER_UPLOAD['DEDUPE_BLOOM_THRESHOLD']
+        if exact:
+            key_sets = {column: KeySet() for column in UNIQUE_COLUMNS}
+        else:
+            error_rate = settings.VOTER_UPLOAD['DEDUPE_FALSE_POSITIVE_RATE']
+            key_sets = {column: BloomFilter(existing + expected_rows, error_rate) for column in UNIQUE_COLUMNS}
+
+        keys = Voter.objects.values_list(*UNIQUE_COLUMNS).iterator(chunk_size=SEED_CHUNK_SIZE)
+        while batch := list(islice(keys, SEED_CHUNK_SIZE)):
+            for column, values in zip(UNIQUE_COLUMNS, zip(*batch, strict=True), strict=True):
+                key_sets[column].add(np.array(values, dtype=object))
+
+        logger.info(f'Seeded duplicate filter with {existing} voters in {"exact sets" if exact else "Bloom filters"}')
+        return cls(key_sets)
+
+    def drop_duplicates(self, voters: pd.DataFrame) -> tuple[pd.DataFrame, int]:
+        """Return the voters that may still be inserted and the number of rows dropped."""
+        if voters.empty:
+            return voters, 0
+
+        known = np.zeros(len(voters), dtype=bool)
+        suspects = np.zeros(len(voters), dtype=bool)
+        for column, key_set in self.key_sets.items():
+            if key_set.exact:
+                known |= key_set.contains(voters[column].to_numpy(dtype=object))
+            else:
+                suspects |= key_set.contains(voters[column].to_numpy(dtype=object))
+
+        suspects &= ~known
+        if suspects.any():
+            known |= self._confirm(voters[suspects], suspects)
+
+        # like the unique indexes, a row only takes its keys when it is kept itself
+        keep = ~known
+        seen = {column: set() for column in UNIQUE_COLUMNS}
+        columns = [voters[column].tolist() for column in UNIQUE_COLUMNS]
+        for index in np.flatnonzero(keep):
+            keys = [column[index] for column in columns]
+            if any(key in seen[column] for column, key in zip(UNIQUE_COLUMNS, keys, strict=True)):
+                keep[index] = False
+                continue
+            for column, key in zip(UNIQUE_COLUMNS, keys, strict=True):
+                seen[column].add(key)
+
+        return voters[keep], int((~keep).sum())
+
+    def add(self, voters: pd.DataFrame, inserted: int):
+        """
+        Remember the keys of the voters of a chunk that were inserted.
+
+        Args:
+            voters (pd.DataFrame): The voters returned by ``drop_duplicates``.
+            inserted (int): How many of them the database accepted.
+        """
+        if all(isinstance(key_set, IndexLookup) for key_set in self.key_sets.values()):
+            return
+
+        if inserted < len(voters):
+            # some rows lost a race with a concurrent insert, only their winners' keys are taken
+            saved = Voter.objects.filter(id__in=voters['id'].tolist()).values_list('id', flat=True)
+            voters = voters[voters['id'].isin(set(saved))]
+
+        for column, key_set in self.key_sets.items():
+            key_set.add(voters[column].to_numpy(dtype=object))
+
+    @staticmethod
+    def _confirm(suspects: pd.DataFrame, mask: np.ndarray) -> np.ndarray:
+        """Look up the rows flagged by a Bloom filter, returning a mask of the ones that really exist."""
+        confirmed = np.zeros(len(mask), dtype=bool)
+        taken = np.zeros(len(suspects), dtype=bool)
+        for column in UNIQUE_COLUMNS:
+            values = suspects[column].tolist()
+            existing = set(Voter.objects.filter(**{f'{column}__in': values}).values_list(column, flat=True))
+            taken |= suspects[column].isin(existing).to_numpy()
+        confirmed[np.flatnonzero(mask)[taken]] = True
+        return confirmed
+
+
+class _SharedFilter:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.duplicates = None
+        self.users = 0
+
+
+_shared_filters: dict[str, _SharedFilter] = {}
+_shared_filters_lock = threading.Lock()
+
+
+@contextmanager
+def shared_duplicate_filter(upload_id: str, expected_rows: int = 0) -> Iterator[DuplicateFilter]:
+    """
+    Give every shard of an upload running in this process the same ``DuplicateFilter``.
+
+    The first shard builds it with ``DuplicateFilter.for_upload`` while the others wait, so the
+    existing voters are loaded once per upload instead of once per shard, and the keys each
+    shard inserts are known to the others. The filter is dropped when its last shard is done.
+
+    Shards add keys concurrently. ``add`` only ever adds keys of committed voters, and the
+    database still rejects anything the filter lets through, so a race costs at most a
+    duplicate reaching the database.
+    """
+    with _shared_filters_lock:
+        shared = _shared_filters.setdefault(upload_id, _SharedFilter())
+        shared.users += 1
+
+    try:
+        with shared.lock:
+            if shared.duplicates is None:
+                shared.duplicates = DuplicateFilter.for_upload(expected_rows)
+        yield shared.duplicates
+    finally:
+        with _shared_filters_lock:
+            shared.users -= 1
+            if not shared.users:
+                del _shared_filters[upload_id]
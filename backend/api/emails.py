@@ -0,0 +1,138 @@
+import logging
+import functools
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from django.conf import settings
+from django.template import Context, Template, engines
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+
+# name -> (template, subject) of every email the app sends
+EMAIL_TEMPLATES = {
+    'otp': ('api/emails/otp.html', 'Your Verification Code for Secure Access'),
+    'upload_completed': ('api/emails/upload_completed.html', 'Voter Upload Processed Successfully'),
+}
+
+
+class BaseEmailBackend:
+    """
+    Deliver emails for ``send_email``.
+
+    A backend is created once per process by ``get_email_backend`` and shared by every Huey
+    worker thread, so it must be thread safe. ``send`` raises ``requests.RequestException``
+    when delivery fails; ``is_retryable`` decides whether the task tries again.
+    """
+
+    def send(self, to: str | list[str], subject: str, html: str):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PlunkBackend(BaseEmailBackend):
+    """
+    Send emails through the Plunk API over a pooled, keep-alive HTTP session.
+
+    Connections are reused across emails and worker threads, so a burst of emails pays for
+    one TLS handshake per pooled connection instead of one per email. Plunk accepts a list of
+    recipients for the same message, so an email to several admins is a single request.
+
+    Separate emails are not batched. ``/send`` takes one subject and body per request, and
+    every email the app sends, an OTP code or an upload's summary, has a body of its own, so
+    emails sharing a template and subject still can't share a request.
+
+    Args:
+        api_url (str): Base URL of the API, e.g. a local fake server in benchmarks.
+        api_key (str): The Plunk secret key.
+        timeout (tuple[float, float]): Connect and read timeouts in seconds.
+        pool_size (int): Maximum number of connections kept open.
+    """
+
+    def __init__(self, api_url: str, api_key: str, timeout: tuple[float, float], pool_size: int):
+        self.url = f'{api_url.rstrip("/")}/send'
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers.update({'Authorization': f'Bearer {api_key}', 'Content-Type': 'application/json'})
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def send(self, to: str | list[str], subject: str, html: str):
+        response = self.session.post(self.url, json={'to': to, 'subject': subject, 'body': html}, timeout=self.timeout)
+        response.raise_for_status()
+
+    def close(self):
+        self.session.close()
+
+
+class MemoryBackend(BaseEmailBackend):
+    """Keep sent emails in ``outbox`` instead of delivering them, for development and benchmarks."""
+
+    outbox: list[dict] = []
+
+    def __init__(self, **_kwargs):
+        pass
+
+    def send(self, to: str | list[str], subject: str, html: str):
+        self.outbox.append({'to': to, 'subject': subject, 'html': html})
+
+
+@functools.cache
+def get_email_template(name: str) -> Template:
+    """
+    Return the compiled template of an email, loading and compiling it once per process.
+
+    Compiled templates keep their static HTML as literal nodes, so rendering only has to
+    fill in the variables.
+    """
+    return engines['django'].get_template(EMAIL_TEMPLATES[name][0]).template
+
+
+def load_email_templates():
+    """Compile every email template up front so that the first email doesn't pay for it."""
+    for name in EMAIL_TEMPLATES:
+        get_email_template(name)
+
+
+def render_email(name: str, context: dict) -> tuple[str, str]:
+    """
+    Render an email with only the given context, without request context processors.
+
+    Args:
+        name (str): A key of ``EMAIL_TEMPLATES``.
+        context (dict): The variables used by the template.
+
+    Returns:
+        tuple[str, str]: The subject and the HTML body.
+    """
+    return EMAIL_TEMPLATES[name][1], get_email_template(name).render(Context(context))
+
+
+@functools.cache
+def get_email_backend() -> BaseEmailBackend:
+    """Create the backend configured in ``EMAIL['BACKEND']``, once per process."""
+    backend_class = import_string(settings.EMAIL['BACKEND'])
+    return backend_class(
+        api_url=settings.EMAIL['API_URL'],
+        api_key=settings.PLUNK_API_KEY,
+        timeout=(settings.EMAIL['CONNECT_TIMEOUT'], settings.EMAIL['READ_TIMEOUT']),
+        pool_size=settings.EMAIL['POOL_SIZE'],
+    )
+
+
+def is_retryable(error: requests.RequestException) -> bool:
+    """Whether a failed delivery may succeed later, i.e. it timed out, couldn't connect or was throttled."""
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and error.response.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(error, requests.ConnectionError | requests.Timeout)
+
+
+def get_retry_delay(attempt: int) -> int:
+    """Seconds to wait before retry number ``attempt``, doubling from ``RETRY_DELAY`` up to ``MAX_RETRY_DELAY``."""
+    return min(settings.EMAIL['RETRY_DELAY'] * 2 ** (attempt - 1), settings.EMAIL['MAX_RETRY_DELAY'])
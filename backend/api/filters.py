@@ -0,0 +1,33 @@
+from rest_framework.filters import OrderingFilter, BaseFilterBackend
+
+
+class FieldFilter(BaseFilterBackend):
+    """
+    Keep the rows whose fields equal one of the values given for them, e.g. ``?gender=F``.
+
+    The fields are listed in the view's ``filter_fields``. A parameter may be repeated to
+    match several values, e.g. ``?department=Physics&department=Chemistry``.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        for field in getattr(view, 'filter_fields', ()):
+            values = [value for value in request.query_params.getlist(field) if value]
+            if values:
+                queryset = queryset.filter(**{f'{field}__in': values})
+        return queryset
+
+
+class KeysetOrderingFilter(OrderingFilter):
+    """
+    ``OrderingFilter`` that always ends with the primary key.
+
+    Sorting by a column that isn't unique, such as ``full_name``, leaves ties in no
+    particular order; the primary key breaks them so that ``KeysetPagination`` always has a
+    unique position to continue from.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view) or [])
+        if not any(field.lstrip('-') in {'id', 'pk'} for field in ordering):
+            ordering.append('-id' if ordering and ordering[-1].startswith('-') else 'id')
+        return ordering
@@ -0,0 +1,441 @@
+import io
+import secrets
+from bisect import bisect_left
+from itertools import islice, pairwise
+from collections.abc import Callable, Iterator
+
+import numpy as np
+import pandas as pd
+import shortuuid
+from openpyxl import load_workbook
+
+from .models import Voter
+
+REQUIRED_COLUMNS = ['email', 'gender', 'full_name', 'department', 'matriculation_number']
+VOTER_ID_PREFIX = 'voter_'
+VOTER_ID_LENGTH = 22  # same length as shortuuid.uuid()
+CSV_COUNT_BLOCK_SIZE = 1_048_576  # 1MB
+CSV_SAMPLE_SIZE = 65_536  # 64KB
+CSV_MAX_QUOTED_LINES = 100  # line breaks a quoted value may hold before its opening quote is taken as a stray one
+EMAIL_PATTERN = r'[^@\s]+@[^@\s]+\.[^@\s.]+'  # a single @, no whitespace, a dot in the domain
+
+
+def get_file_type(upload) -> str:
+    """
+    Return the normalized extension of an upload's file.
+
+    Args:
+        upload (VoterUpload): The upload whose file type should be checked.
+    """
+    file_extension = upload.file.name.split('.')[-1].lower()
+    if file_extension not in ['csv', 'xls', 'xlsx']:
+        msg = f'Unsupported file type: {file_extension}'
+        raise ValueError(msg)
+    return file_extension
+
+
+def end_csv_line(quoted: int, quoted_lines: int, quotes: int) -> tuple[int, int]:
+    """
+    Follow a CSV file past one line break, given the number of ``"`` since the previous one.
+
+    A line break only ends a record when it is outside quotes, i.e. after an even number of
+    ``"`` since the last record ended (escaped quotes are doubled, so they keep the parity).
+    A quote left open for ``CSV_MAX_QUOTED_LINES`` line breaks is taken as a stray ``"`` in an
+    unquoted value, which CSV parsers keep as text, and the record ends at the next line
+    break anyway. One stray quote then only holds that many lines together instead of the
+    rest of the file.
+
+    Returns:
+        tuple[int, int]: Whether a quote is still open, and how many line breaks it has held.
+            The line break ended a record when the first is ``0``.
+    """
+    quoted = (quoted + quotes) % 2
+    if not quoted or quoted_lines >= CSV_MAX_QUOTED_LINES:
+        return 0, 0
+    return 1, quoted_lines + 1
+
+
+def scan_csv_records(file, split_at: list[int] = (), block_size: int = CSV_COUNT_BLOCK_SIZE) -> tuple[int, list[int]]:
+    """
+    Count the records of a CSV file and find where records start, one block at a time.
+
+    Records end at the line breaks ``end_csv_line`` accepts. Blocks without quotes are counted
+    in one go; only blocks with quotes are walked line by line. The file position is reset
+    to the start afterwards.
+
+    Args:
+        file: A binary file handle, e.g. an opened ``FieldFile``.
+        split_at (list[int]): Byte offsets to find the next record of.
+        block_size (int): Number of bytes read at a time.
+
+    Returns:
+        tuple[int, list[int]]: The number of records, header included, and for every offset of
+            ``split_at`` the offset where the first record ending at or after it is followed.
+    """
+    file.seek(0)
+    targets = iter(sorted(split_at))
+    target = next(targets, None)
+    boundaries = []
+    records, quoted, quoted_lines, quotes, position, last_byte = 0, 0, 0, 0, 0, b''
+
+    while block := file.read(block_size):
+        ends = None  # offsets of the line breaks ending a record, only listed in blocks with quotes
+        if quoted or quotes or b'"' in block:
+            ends, start = [], 0
+            while (line_end := block.find(b'\n', start)) != -1:
+                quoted, quoted_lines = end_csv_line(quoted, quoted_lines, quotes + block.count(b'"', start, line_end))
+                quotes, start = 0, line_end + 1
+                if not quoted:
+                    ends.append(line_end)
+            quotes += block.count(b'"', start)  # of a line that goes on in the next block
+            records += len(ends)
+        else:
+            records += block.count(b'\n')
+
+        while target is not None:
+            index = max(target - position, 0)
+            if ends is None:
+                line_end = block.find(b'\n', index)
+            else:
+                found = bisect_left(ends, index)
+                line_end = ends[found] if found < len(ends) else -1
+            if line_end == -1:
+                break
+            boundaries.append(position + line_end + 1)
+            target = next(targets, None)
+
+        position += len(block)
+        last_byte = block[-1:]
+    file.seek(0)
+
+    if last_byte and last_byte != b'\n':
+        records += 1
+    return records, boundaries
+
+
+def count_csv_rows(file, block_size: int = CSV_COUNT_BLOCK_SIZE) -> int:
+    """
+    Count the data rows of a CSV file without holding more than one block in memory.
+
+    Quoted values spanning several lines are counted once, see ``scan_csv_records``. The file
+    position is reset to the start afterwards.
+
+    Args:
+        file: A binary file handle, e.g. an opened ``FieldFile``.
+        block_size (int): Number of bytes read at a time.
+    """
+    records, _ = scan_csv_records(file, block_size=block_size)
+    return max(records - 1, 0)  # the header is not a record
+
+
+def count_xlsx_rows(file) -> int | None:
+    """
+    Read the data row count of an ``.xlsx`` file from its worksheet dimensions.
+
+    Returns ``None`` when the workbook does not record its dimensions. The file position is
+    reset to the start afterwards.
+    """
+    file.seek(0)
+    workbook = load_workbook(file, read_only=True)
+    try:
+        max_row = workbook.active.max_row
+    finally:
+        workbook.close()
+    file.seek(0)
+
+    return None if max_row is None else max(max_row - 1, 0)
+
+
+def count_upload_rows(file, file_type: str) -> int | None:
+    """Estimate the number of records in an uploaded file, or ``None`` if it can't be done cheaply."""
+    if file_type == 'csv':
+        return count_csv_rows(file)
+    if file_type == 'xlsx':
+        return count_xlsx_rows(file)
+    return None
+
+
+def estimate_csv_rows(file, sample_size: int = CSV_SAMPLE_SIZE) -> int:
+    """
+    Estimate the data rows of a CSV file from its size and the average length of its first lines.
+
+    Only ``sample_size`` bytes are read, so this is cheap enough to run while the upload
+    request is being handled. Files that fit in the sample are counted exactly. The file
+    position is reset to the start afterwards.
+
+    Args:
+        file: A seekable binary file handle, e.g. an ``UploadedFile``.
+        sample_size (int): Number of bytes read from the start of the file.
+    """
+    size = file.seek(0, io.SEEK_END)
+    file.seek(0)
+    sample = file.read(sample_size)
+    file.seek(0)
+    if len(sample) >= size:
+        return count_csv_rows(file)
+
+    header, *lines = sample.split(b'\n')
+    lines = lines[:-1]  # the last line is probably cut by the sample
+    if not lines:
+        return 1
+    average_length = sum(len(line) + 1 for line in lines) / len(lines)
+    return round((size - len(header) - 1) / average_length)
+
+
+def estimate_upload_rows(file, file_type: str) -> int | None:
+    """Estimate the number of records of a file before it is stored, or ``None`` if it can't be done cheaply."""
+    if file_type == 'csv':
+        return estimate_csv_rows(file)
+    if file_type == 'xlsx':
+        return count_xlsx_rows(file)
+    return None
+
+
+def plan_csv_shards(file, shard_count: int) -> tuple[int, list[tuple[int, int]]]:
+    """
+    Count the data rows of a CSV file and split it into at most ``shard_count`` byte ranges of whole records.
+
+    Both come out of a single read of the file with ``scan_csv_records``, so quoted values
+    spanning several lines are never cut between two shards. The header line is left out of
+    every range; ``iter_csv_blocks`` puts it back in front of each shard.
+
+    Args:
+        file: A seekable binary file handle.
+        shard_count (int): The desired number of shards.
+    """
+    size = file.seek(0, io.SEEK_END)
+    records, boundaries = scan_csv_records(file, [size * shard // shard_count for shard in range(shard_count)])
+
+    starts = boundaries[:1] or [size]  # a header without a line break and no records
+    for boundary in boundaries[1:]:
+        if starts[-1] < boundary < size:
+            starts.append(boundary)
+    return max(records - 1, 0), list(pairwise([*starts, size]))
+
+
+class CsvByteRange(io.RawIOBase):
+    """A read-only view of a CSV file made of its header line followed by one byte range."""
+
+    def __init__(self, file, start: int, end: int):
+        file.seek(0)
+        self._pending = file.readline()
+        self._file = file
+        self._remaining = end - start
+        file.seek(start)
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, buffer) -> int:
+        if not self._pending and self._remaining > 0:
+            self._pending = self._file.read(min(len(buffer), self._remaining))
+            self._remaining = self._remaining - len(self._pending) if self._pending else 0
+
+        size = min(len(buffer), len(self._pending))
+        buffer[:size] = self._pending[:size]
+        self._pending = self._pending[size:]
+        return size
+
+
+def iter_upload_frames(file, file_type: str, chunk_size: int, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Yield the rows of an uploaded file as DataFrames.
+
+    CSV and XLSX files are streamed ``chunk_size`` rows at a time, so only one chunk is ever
+    held in memory. Columns of CSV and XLS files are read as text, so that values such as
+    matriculation numbers keep their leading zeros instead of being coerced into numbers.
+
+    Args:
+        file: A binary file handle, local or remote (e.g. S3) storage alike.
+        file_type (str): The value returned by ``get_file_type``.
+        chunk_size (int): Maximum number of rows per frame.
+        skip_rows (int): Number of data rows to leave out at the start, e.g. when resuming.
+    """
+    if file_type == 'csv':
+        with pd.read_csv(file, dtype=str, chunksize=chunk_size, skiprows=range(1, skip_rows + 1)) as reader:
+            yield from reader
+    elif file_type == 'xlsx':
+        yield from iter_xlsx_frames(file, chunk_size, skip_rows=skip_rows)
+    else:
+        yield pd.read_excel(file, dtype=str).iloc[skip_rows:]
+
+
+def iter_csv_blocks(file, chunk_size: int, byte_range: tuple[int, int] | None = None) -> Iterator[tuple[bytes, int]]:
+    """
+    Yield self-contained CSV documents made of the header and about ``chunk_size`` lines.
+
+    The blocks are raw bytes, so they can be handed to ``parse_csv_block`` in another process.
+    A block that ends inside a quoted value is extended to the line that closes it, so every
+    block holds whole records as ``end_csv_line`` finds them, the same as the shard ranges of
+    ``plan_csv_shards``. A stray quote extends a block by ``CSV_MAX_QUOTED_LINES`` lines at
+    most. Each block comes with the byte offset of the record that follows it.
+
+    Args:
+        file: A seekable binary file handle.
+        chunk_size (int): Maximum number of rows per block.
+        byte_range (tuple[int, int] | None): Only read the rows of this shard.
+    """
+    if byte_range is None:
+        file.seek(0)
+        byte_range = (len(file.readline()), file.seek(0, io.SEEK_END))
+    stream = io.BufferedReader(CsvByteRange(file, *byte_range))
+    header = stream.readline()
+    offset = byte_range[0]
+
+    quoted = quoted_lines = 0
+    while lines := list(islice(stream, chunk_size)):
+        for line in lines:
+            quoted, quoted_lines = end_csv_line(quoted, quoted_lines, line.count(b'"'))
+        while quoted and (line := stream.readline()):
+            lines.append(line)
+            quoted, quoted_lines = end_csv_line(quoted, quoted_lines, line.count(b'"'))
+        offset += sum(len(line) for line in lines)
+        yield header + b''.join(lines), offset
+
+
+def iter_upload_chunks(
+    file, file_type: str, chunk_size: int, start: int, end: int | None = None
+) -> Iterator[tuple[Callable, bytes | pd.DataFrame, int]]:
+    """
+    Yield the chunks of one shard of an upload with the function that prepares them and the offset they end at.
+
+    CSV shards are read as raw blocks of lines from byte ``start`` to byte ``end`` and prepared
+    with ``parse_csv_block``. Excel files are read as frames from data row ``start`` on and
+    prepared with ``prepare_voters``. The function and the chunk can be sent to another
+    process, and the offset is where the shard resumes once the chunk is saved.
+
+    Args:
+        file: A seekable binary file handle.
+        file_type (str): The value returned by ``get_file_type``.
+        chunk_size (int): Maximum number of rows per chunk.
+        start (int): Byte offset (CSV) or data row (Excel) to start from.
+        end (int | None): Byte offset the CSV shard ends at.
+    """
+    if file_type == 'csv':
+        for block, offset in iter_csv_blocks(file, chunk_size, (start, end)):
+            yield parse_csv_block, block, offset
+        return
+
+    offset = start
+    for frame in iter_upload_frames(file, file_type, chunk_size, skip_rows=start):
+        offset += len(frame)
+        yield prepare_voters, frame, offset
+
+
+def iter_xlsx_frames(file, chunk_size: int, skip_rows: int = 0) -> Iterator[pd.DataFrame]:
+    """
+    Stream the first worksheet of an ``.xlsx`` file as DataFrames of ``chunk_size`` rows.
+
+    The workbook is opened in openpyxl's read-only mode and only cell values are pulled,
+    so no cell objects or styles are kept around and memory stays bounded by the chunk.
+    Columns without a header and fully empty rows are skipped, like ``pd.read_excel`` does,
+    and so are the first ``skip_rows`` data rows.
+    """
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+
+        positions = [index for index, name in enumerate(header) if name is not None]
+        columns = [str(header[index]).strip() for index in positions]
+        rows = ([row[index] for index in positions] for row in rows if any(value is not None for value in row))
+        rows = islice(rows, skip_rows, None)
+
+        while chunk := list(islice(rows, chunk_size)):
+            yield pd.DataFrame(chunk, columns=columns, dtype=object)
+    finally:
+        workbook.close()
+
+
+def generate_voter_ids(count: int) -> np.ndarray:
+    """
+    Generate ``count`` voter identifiers in one go.
+
+    The identifiers use the shortuuid alphabet and length, so they look exactly like the
+    ones produced by ``Voter.save``, but they are drawn as a single NumPy array instead of
+    calling ``shortuuid.uuid()`` once per row.
+    """
+    alphabet = np.frombuffer(shortuuid.get_alphabet().encode(), dtype=np.uint8)
+    rng = np.random.default_rng(secrets.randbits(128))
+    indexes = rng.integers(0, len(alphabet), size=(count, VOTER_ID_LENGTH), dtype=np.uint8)
+    suffixes = alphabet[indexes].view(f'S{VOTER_ID_LENGTH}').ravel()
+    return np.char.add(VOTER_ID_PREFIX, suffixes.astype(str))
+
+
+def validate_voters(frame: pd.DataFrame) -> np.ndarray:
+    """
+    Check whole columns of normalized voters at once and return why each row is rejected.
+
+    A row is rejected when a value is missing, the email doesn't look like an address, the
+    gender isn't a single character or a value doesn't fit its column. Only the first
+    problem of a row is reported.
+
+    Returns:
+        np.ndarray: The reason of every row, an empty string for valid rows.
+    """
+    conditions = [frame[column].isna() | frame[column].eq('') for column in REQUIRED_COLUMNS]
+    reasons = [f'missing {column}' for column in REQUIRED_COLUMNS]
+
+    conditions.append(~frame['email'].str.fullmatch(EMAIL_PATTERN))
+    reasons.append('invalid email')
+    conditions.append(frame['gender'].str.len().ne(1))
+    reasons.append('gender must be a single character')
+
+    lengths = frame.apply(lambda column: column.str.len())
+    for column in REQUIRED_COLUMNS:
+        max_length = Voter._meta.get_field(column).max_length  # noqa: SLF001
+        conditions.append(lengths[column].gt(max_length))
+        reasons.append(f'{column} longer than {max_length} characters')
+
+    conditions = [condition.fillna(value=False).to_numpy(dtype=bool) for condition in conditions]
+    return np.select(conditions, reasons, default='')
+
+
+def prepare_voters(df: pd.DataFrame, added_by_id: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Normalize, validate and assign identifiers to a whole frame of voters at once.
+
+    Args:
+        df (pd.DataFrame): Raw rows as read from the uploaded file.
+        added_by_id (str): Identifier of the admin who owns the upload.
+
+    Returns:
+        tuple[pd.DataFrame, pd.DataFrame]: The rows ready to be inserted, and the rejected rows as
+            they were uploaded with a ``reason`` column, see ``validate_voters``.
+    """
+    if set(REQUIRED_COLUMNS) != set(df.columns):
+        msg = f'Column mismatch. Expected: {", ".join(REQUIRED_COLUMNS)}'
+        raise ValueError(msg)
+
+    frame = df[REQUIRED_COLUMNS].astype('string').apply(lambda column: column.str.strip())
+
+    reasons = validate_voters(frame)
+    valid = reasons == ''
+    rejected = df.loc[~valid, REQUIRED_COLUMNS].assign(reason=reasons[~valid])
+    frame = frame[valid]
+
+    frame = frame.assign(id=generate_voter_ids(len(frame)), added_by_id=added_by_id)
+    return frame, rejected
+
+
+def parse_csv_block(block: bytes, added_by_id: str) -> tuple[pd.DataFrame, pd.DataFrame]:
+    """Parse and prepare one block from ``iter_csv_blocks``; see ``prepare_voters``."""
+    return prepare_voters(pd.read_csv(io.BytesIO(block), dtype=str), added_by_id=added_by_id)
+
+
+def iter_voter_batches(frame: pd.DataFrame, batch_size: int):
+    """
+    Yield lists of unsaved ``Voter`` instances built straight from the frame's columns.
+
+    Args:
+        frame (pd.DataFrame): Rows returned by ``prepare_voters``.
+        batch_size (int): Maximum number of voters per list.
+    """
+    fields = ['id', 'added_by_id', *REQUIRED_COLUMNS]
+    columns = [frame[field].tolist() for field in fields]
+
+    for start in range(0, len(frame), batch_size):
+        rows = zip(*(column[start : start + batch_size] for column in columns), strict=True)
+        yield [Voter(**dict(zip(fields, row, strict=True))) for row in rows]
@@ -0,0 +1,66 @@
+import io
+from collections.abc import Callable
+
+import pandas as pd
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import Voter
+from .ingestion import REQUIRED_COLUMNS, iter_voter_batches
+
+BATCH_SIZE = 1000
+VOTER_TABLE = 'api_voter'
+STAGING_TABLE = 'api_voter_staging'
+VOTER_COLUMNS = ['id', 'added_by_id', *REQUIRED_COLUMNS]
+
+
+def orm_load_voters(voters: pd.DataFrame) -> int:
+    """
+    Insert voters with ``bulk_create`` in ``BATCH_SIZE`` batches, skipping conflicting rows.
+
+    Returns the number of rows actually inserted. This works on every database Django supports
+    and is the fallback for SQLite.
+    """
+    inserted = 0
+    for batch in iter_voter_batches(voters, BATCH_SIZE):
+        Voter.objects.bulk_create(batch, ignore_conflicts=True)
+        # with ignore_conflicts every object is returned, so count the freshly generated ids that landed
+        inserted += Voter.objects.filter(id__in=[voter.id for voter in batch]).count()
+    return inserted
+
+
+def copy_load_voters(voters: pd.DataFrame) -> int:
+    """
+    Insert voters through a PostgreSQL ``COPY`` into a staging table.
+
+    The rows are streamed as CSV into a temporary table that lives for the whole connection
+    and is emptied on commit, then moved into the voters table with a single
+    ``INSERT ... SELECT ... ON CONFLICT DO NOTHING`` whose row count is the number of
+    rows actually inserted. Rows are inserted in email order so that concurrent loads take
+    their index locks in a consistent order. Must run inside a transaction.
+    """
+    columns = ', '.join(VOTER_COLUMNS)
+    buffer = io.StringIO()
+    voters[VOTER_COLUMNS].to_csv(buffer, header=False, index=False)
+    buffer.seek(0)
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TEMPORARY TABLE IF NOT EXISTS {STAGING_TABLE} '
+            f'({", ".join(f"{column} text" for column in VOTER_COLUMNS)}) ON COMMIT DELETE ROWS'
+        )
+        cursor.copy_expert(f'COPY {STAGING_TABLE} ({columns}) FROM STDIN WITH (FORMAT csv)', buffer)
+        cursor.execute(
+            f'INSERT INTO {VOTER_TABLE} ({columns}, created_at) '  # noqa: S608
+            f'SELECT {columns}, %s FROM {STAGING_TABLE} ORDER BY email ON CONFLICT DO NOTHING',
+            [timezone.now()],
+        )
+        return cursor.rowcount
+
+
+def get_voter_loader() -> Callable[[pd.DataFrame], int]:
+    """Pick the fastest loader the configured database supports."""
+    if connection.vendor == 'postgresql':
+        return copy_load_voters
+    return orm_load_voters
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.stats import rebuild_voter_counts
+from api.models import Admin
+
+
+class Command(BaseCommand):
+    help = 'Recount the voters per department and gender that the dashboards read, from the voters table.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--admin', help='Only rebuild the counts of the admin with this email address.')
+
+    def handle(self, *args, **options):
+        admin_id = None
+        if options['admin']:
+            admin_id = Admin.objects.filter(email=options['admin']).values_list('id', flat=True).first()
+            if admin_id is None:
+                msg = f'No admin with the email address {options["admin"]}'
+                raise CommandError(msg)
+
+        groups = rebuild_voter_counts(admin_id)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {groups} voter counts'))
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-17 13:03
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0003_voterupload_reason_alter_voterupload_file'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voterupload',
+            name='duplicate_records',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='voterupload',
+            name='invalid_records',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-17 13:04
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0004_voterupload_duplicate_records_invalid_records'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voterupload',
+            name='completed_shards',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='voterupload',
+            name='shard_count',
+            field=models.IntegerField(default=1),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-17 13:16
+
+import django.db.models.deletion
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0005_voterupload_shard_count_completed_shards'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='voter',
+            name='added_by',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.admin'),
+        ),
+        migrations.AlterField(
+            model_name='voterupload',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.admin'),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(fields=['added_by', 'created_at', 'id'], name='voter_added_by_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='voterupload',
+            index=models.Index(fields=['user', 'created_at'], name='voterupload_user_created_idx'),
+        ),
+    ]
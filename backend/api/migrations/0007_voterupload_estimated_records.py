@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-17 13:28
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0006_voter_list_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voterupload',
+            name='estimated_records',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+    ]
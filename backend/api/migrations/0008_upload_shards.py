@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-17 13:31
+
+import django.db.models.deletion
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0007_voterupload_estimated_records'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voterupload',
+            name='heartbeat_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='UploadShard',
+            fields=[
+                ('id', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='identifier')),
+                ('start', models.BigIntegerField()),
+                ('end', models.BigIntegerField(blank=True, null=True)),
+                ('offset', models.BigIntegerField()),
+                ('inserted_records', models.IntegerField(default=0)),
+                ('duplicate_records', models.IntegerField(default=0)),
+                ('invalid_records', models.IntegerField(default=0)),
+                ('completed', models.BooleanField(default=False)),
+                ('lease', models.CharField(default='', max_length=32)),
+                ('heartbeat_at', models.DateTimeField(blank=True, null=True)),
+                (
+                    'upload',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='api.voterupload'
+                    ),
+                ),
+            ],
+        ),
+    ]
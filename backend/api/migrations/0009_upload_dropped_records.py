@@ -0,0 +1,22 @@
+# Generated by Django 5.1.1 on 2026-10-17 13:43
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0008_upload_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadshard',
+            name='dropped_records',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='voterupload',
+            name='dropped_records',
+            field=models.IntegerField(default=0),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-17 13:48
+
+import django.db.models.deletion
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0009_upload_dropped_records'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voterupload',
+            name='rejected_file',
+            field=models.FileField(blank=True, upload_to='rejected'),
+        ),
+        migrations.CreateModel(
+            name='RejectedChunk',
+            fields=[
+                ('id', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='identifier')),
+                ('offset', models.BigIntegerField()),
+                ('rows', models.TextField()),
+                (
+                    'shard',
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name='rejected_chunks',
+                        to='api.uploadshard',
+                    ),
+                ),
+            ],
+        ),
+    ]
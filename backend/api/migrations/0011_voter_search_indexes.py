@@ -0,0 +1,59 @@
+# Generated by Django 5.1.1 on 2026-10-17 14:24
+
+from django.db import models, migrations
+from django.db.models.functions import Upper
+from django.contrib.postgres.indexes import OpClass, GinIndex
+
+# column -> index name of the columns searched with icontains, which Django compares as UPPER(column) LIKE UPPER(term)
+TRIGRAM_INDEXES = {
+    'full_name': 'voter_full_name_trgm_idx',
+    'email': 'voter_email_trgm_idx',
+    'matriculation_number': 'voter_matric_trgm_idx',
+}
+
+
+def trigram_index(column: str) -> GinIndex:
+    return GinIndex(OpClass(Upper(column), name='gin_trgm_ops'), name=TRIGRAM_INDEXES[column])
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # GIN indexes only exist on PostgreSQL, and pg_trgm ships with its contrib package; without
+    # them searches still work, scanning the admin's voters with LIKE like on SQLite
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+
+    voter = apps.get_model('api', 'Voter')
+    for column in TRIGRAM_INDEXES:
+        schema_editor.add_index(voter, trigram_index(column))
+
+
+def drop_trigram_indexes(_apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in TRIGRAM_INDEXES.values():
+        schema_editor.execute(f'DROP INDEX IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0010_upload_rejected_rows'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(
+                fields=['added_by', 'department', 'created_at', 'id'], name='voter_added_by_department_idx'
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='voter',
+            index=models.Index(fields=['added_by', 'full_name', 'id'], name='voter_added_by_full_name_idx'),
+        ),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
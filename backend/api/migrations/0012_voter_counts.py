@@ -0,0 +1,46 @@
+# Generated by Django 5.1.1 on 2026-10-17 14:28
+
+import shortuuid
+
+import django.db.models.deletion
+from django.db import models, migrations
+from django.db.models import Count
+
+
+def count_existing_voters(apps, _schema_editor):
+    voter = apps.get_model('api', 'Voter')
+    voter_count = apps.get_model('api', 'VoterCount')
+    groups = voter.objects.values('added_by_id', 'department', 'gender').annotate(count=Count('id')).order_by()
+    voter_count.objects.bulk_create(
+        [voter_count(id=f'count_{shortuuid.uuid()}', **group) for group in groups.iterator()], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0011_voter_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VoterCount',
+            fields=[
+                ('id', models.CharField(max_length=50, primary_key=True, serialize=False, verbose_name='identifier')),
+                ('department', models.CharField(max_length=100)),
+                ('gender', models.CharField(max_length=1)),
+                ('count', models.BigIntegerField(default=0)),
+                (
+                    'added_by',
+                    models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.admin'),
+                ),
+            ],
+            options={
+                'constraints': [
+                    models.UniqueConstraint(
+                        fields=('added_by', 'department', 'gender'), name='votercount_group_unique'
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(count_existing_voters, migrations.RunPython.noop),
+    ]
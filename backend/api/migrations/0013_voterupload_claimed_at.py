@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-17 15:13
+
+from django.db import models, migrations
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ('api', '0012_voter_counts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='voterupload',
+            name='claimed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
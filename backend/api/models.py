@@ -1,8 +1,10 @@
 import shortuuid
 
-from django.db import models
+from django.db import models, transaction
 from django.core.validators import FileExtensionValidator
 
+from .versions import VOTERS, bump_list_version
+
 
 class Admin(models.Model):
     id = models.CharField('identifier', max_length=50, primary_key=True)
@@ -31,18 +33,30 @@ class VoterUpload(models.Model):
 
     updated_at = models.DateTimeField(auto_now=True)
     processed_records = models.IntegerField(default=0)
+    duplicate_records = models.IntegerField(default=0)
+    dropped_records = models.IntegerField(default=0)  # duplicates dropped before reaching the database
+    invalid_records = models.IntegerField(default=0)
+    shard_count = models.IntegerField(default=1)
+    completed_shards = models.IntegerField(default=0)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # last sign of life of the task handling it
+    claimed_at = models.DateTimeField(null=True, blank=True)  # when process_upload was last enqueued for it
     created_at = models.DateTimeField(auto_now_add=True)
-    user = models.ForeignKey(Admin, on_delete=models.CASCADE)
+    user = models.ForeignKey(Admin, on_delete=models.CASCADE, db_index=False)  # covered by the index below
     total_records = models.IntegerField(null=True, blank=True)
+    estimated_records = models.IntegerField(null=True, blank=True)  # sampled when the file is received
     file = models.FileField(
         upload_to='voters',
         blank=False,
         null=False,
         validators=[FileExtensionValidator(allowed_extensions=['csv', 'xls', 'xlsx'])],
     )
+    rejected_file = models.FileField(upload_to='rejected', blank=True)  # CSV of the invalid rows, if there were any
     reason = models.TextField(default='')  # only when the status is failed
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
 
+    class Meta:
+        indexes = [models.Index(fields=['user', 'created_at'], name='voterupload_user_created_idx')]
+
     def __str__(self):
         return f'Upload {self.id} - {self.status}'
 
@@ -53,9 +67,86 @@ class VoterUpload(models.Model):
         return super().save(*args, **kwargs)
 
 
+class UploadShard(models.Model):
+    """
+    A part of an upload processed by one task, and the checkpoint it resumes from.
+
+    ``start``, ``end`` and ``offset`` are byte offsets for CSV files and data rows for Excel
+    files. ``offset`` and the counts only move in the transaction that inserts the voters
+    they describe, so a resumed shard neither skips nor repeats a chunk.
+    """
+
+    id = models.CharField('identifier', max_length=50, primary_key=True)
+    upload = models.ForeignKey(VoterUpload, on_delete=models.CASCADE, related_name='shards')
+
+    start = models.BigIntegerField()
+    end = models.BigIntegerField(null=True, blank=True)  # only for CSV files
+    offset = models.BigIntegerField()
+    inserted_records = models.IntegerField(default=0)
+    duplicate_records = models.IntegerField(default=0)
+    dropped_records = models.IntegerField(default=0)  # duplicates dropped before reaching the database
+    invalid_records = models.IntegerField(default=0)
+    completed = models.BooleanField(default=False)
+    lease = models.CharField(max_length=32, default='')  # token of the task run currently owning the shard
+    heartbeat_at = models.DateTimeField(null=True, blank=True)  # None until a task starts on the shard
+
+    def __str__(self):
+        return f'Shard {self.id} of {self.upload_id}'
+
+    def save(self, *args, **kwargs) -> None:
+        if not self.id:
+            self.id = f'shard_{shortuuid.uuid()}'
+
+        return super().save(*args, **kwargs)
+
+
+class RejectedChunk(models.Model):
+    """
+    The rows of one chunk of a shard that failed validation, kept until the upload is finalized.
+
+    A chunk's rejected rows are saved in the transaction that inserts its voters and moves
+    the shard's offset, so a resumed shard reports them exactly once. ``finalize_upload``
+    assembles them into the upload's ``rejected_file``.
+    """
+
+    id = models.CharField('identifier', max_length=50, primary_key=True)
+    shard = models.ForeignKey(UploadShard, on_delete=models.CASCADE, related_name='rejected_chunks')
+    offset = models.BigIntegerField()  # where the chunk ends in the shard, to keep the file's order
+    rows = models.TextField()  # CSV lines without a header
+
+    def save(self, *args, **kwargs) -> None:
+        if not self.id:
+            self.id = f'rejected_{shortuuid.uuid()}'
+
+        return super().save(*args, **kwargs)
+
+
+class VoterQuerySet(models.QuerySet):
+    def delete(self):
+        """
+        Delete the voters and recount the groups they were counted in.
+
+        ``Voter`` has no delete signals, so Django deletes a set of voters with one query
+        instead of loading them and deleting them one at a time. Counts and list versions are
+        updated here for the whole set instead, in the deleting transaction.
+        """
+        from .stats import recount_voter_groups  # noqa: PLC0415 (stats imports the models)
+
+        with transaction.atomic():
+            groups = set(self.order_by().values_list('added_by_id', 'department', 'gender').distinct())
+            deleted = super().delete()
+            recount_voter_groups(groups)
+            for admin_id in {admin_id for admin_id, _, _ in groups}:
+                bump_list_version(VOTERS, admin_id)
+        return deleted
+
+    delete.alters_data = True
+    delete.queryset_only = True
+
+
 class Voter(models.Model):
     id = models.CharField('identifier', max_length=50, primary_key=True)
-    added_by = models.ForeignKey(Admin, on_delete=models.CASCADE)
+    added_by = models.ForeignKey(Admin, on_delete=models.CASCADE, db_index=False)  # covered by the index below
 
     email = models.EmailField(unique=True)
     gender = models.CharField(max_length=1)
@@ -64,6 +155,15 @@ class Voter(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     matriculation_number = models.CharField(max_length=20, unique=True)
 
+    objects = VoterQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['added_by', 'created_at', 'id'], name='voter_added_by_created_idx'),
+            models.Index(fields=['added_by', 'department', 'created_at', 'id'], name='voter_added_by_department_idx'),
+            models.Index(fields=['added_by', 'full_name', 'id'], name='voter_added_by_full_name_idx'),
+        ]
+
     def __str__(self):
         return f'{self.matriculation_number} - {self.full_name}'
 
@@ -72,3 +172,45 @@ class Voter(models.Model):
             self.id = f'voter_{shortuuid.uuid()}'
 
         return super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        from .stats import recount_voter_groups  # noqa: PLC0415 (stats imports the models)
+
+        with transaction.atomic():
+            deleted = super().delete(*args, **kwargs)
+            recount_voter_groups({(self.added_by_id, self.department, self.gender)})
+            bump_list_version(VOTERS, self.added_by_id)
+        return deleted
+
+
+class VoterCount(models.Model):
+    """
+    How many voters of an admin are in a department and of a gender.
+
+    A summary of the voters table that dashboards read instead of counting voters. It is
+    kept up to date by ``batch_create_voters`` in the transaction that inserts the voters,
+    by a signal when single voters are created, and by ``Voter.delete`` and
+    ``VoterQuerySet.delete``, which recount the groups of deleted voters. The counts of an
+    admin are deleted along with the admin. Other changes to voters, such as edits in the
+    Django admin, are only picked up by ``manage.py rebuild_voter_counts``.
+    """
+
+    id = models.CharField('identifier', max_length=50, primary_key=True)
+    added_by = models.ForeignKey(Admin, on_delete=models.CASCADE, db_index=False)  # covered by the constraint below
+    department = models.CharField(max_length=100)
+    gender = models.CharField(max_length=1)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['added_by', 'department', 'gender'], name='votercount_group_unique')
+        ]
+
+    def __str__(self):
+        return f'{self.department} ({self.gender}): {self.count}'
+
+    def save(self, *args, **kwargs) -> None:
+        if not self.id:
+            self.id = f'count_{shortuuid.uuid()}'
+
+        return super().save(*args, **kwargs)
@@ -0,0 +1,111 @@
+import time
+import secrets
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+
+OTP_KEY_PREFIX = 'otp:'
+
+# checks a code and either consumes it or counts the failed attempt, in one round trip
+VERIFY_SCRIPT = """
+local code = redis.call('HGET', KEYS[1], 'code')
+if not code then
+    return 0
+end
+if code == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+    return 1
+end
+if redis.call('HINCRBY', KEYS[1], 'attempts', 1) >= tonumber(ARGV[2]) then
+    redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+_verify_script = None
+
+
+def _get_redis_client(key: str):
+    """Return the raw Redis client behind the default cache and the full key, or ``None`` for other caches."""
+    backend = caches['default']
+    if not isinstance(backend, RedisCache):
+        return None, key
+    key = backend.make_and_validate_key(key)
+    return backend._cache.get_client(key, write=True), key  # noqa: SLF001
+
+
+def issue_otp(email: str) -> str:
+    """
+    Generate a one-time password for an email address and store it, replacing any previous one.
+
+    The code and its failed attempt counter live in a single cache entry that expires after
+    ``OTP['TTL']`` seconds. Nothing is written to the database.
+    """
+    otp = ''.join(str(secrets.randbelow(10)) for _ in range(settings.OTP['LENGTH']))
+    client, key = _get_redis_client(f'{OTP_KEY_PREFIX}{email}')
+
+    if client is None:
+        entry = {'code': otp, 'nonce': secrets.token_hex(8), 'expires_at': time.time() + settings.OTP['TTL']}
+        cache.set(key, entry, timeout=settings.OTP['TTL'])
+        return otp
+
+    with client.pipeline() as pipeline:
+        pipeline.delete(key)
+        pipeline.hset(key, mapping={'code': otp, 'attempts': 0})
+        pipeline.expire(key, settings.OTP['TTL'])
+        pipeline.execute()
+    return otp
+
+
+def verify_otp(email: str, otp: str) -> bool:
+    """
+    Check a one-time password and consume it if it matches.
+
+    On Redis the check, the deletion and the attempt count happen atomically in a Lua script,
+    so a code can only ever be used once, even by concurrent requests. A code is also
+    dropped after ``OTP['MAX_ATTEMPTS']`` wrong guesses. Other caches go through
+    ``_verify_cached_otp``.
+    """
+    global _verify_script  # noqa: PLW0603
+
+    client, key = _get_redis_client(f'{OTP_KEY_PREFIX}{email}')
+    if client is None:
+        return _verify_cached_otp(key, otp)
+
+    if _verify_script is None:
+        _verify_script = client.register_script(VERIFY_SCRIPT)
+    return bool(_verify_script(keys=[key], args=[otp, settings.OTP['MAX_ATTEMPTS']], client=client))
+
+
+def _verify_cached_otp(key: str, otp: str) -> bool:
+    """
+    Check a one-time password kept in a cache other than Redis, which may be shared by processes.
+
+    Every check first claims one of the code's ``OTP['MAX_ATTEMPTS']`` attempts, and a matching
+    code then claims its single use, each with ``cache.add``. Only one caller can add a key,
+    so however many workers check a code at once it is accepted once and tried at most
+    ``MAX_ATTEMPTS`` times. This relies on ``add`` being atomic, as it is for the database,
+    memcached and local memory caches but not the file-based one.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return False
+    claim = f'{key}:{entry["nonce"]}'
+    timeout = max(entry['expires_at'] - time.time(), 1)
+
+    attempts = range(settings.OTP['MAX_ATTEMPTS'])
+    attempt = next((attempt for attempt in attempts if cache.add(f'{claim}:{attempt}', 1, timeout)), None)
+    if attempt is None:  # every attempt was taken by concurrent checks
+        cache.delete(key)
+        return False
+
+    if secrets.compare_digest(entry['code'].encode(), otp.encode()):
+        if not cache.add(f'{claim}:used', 1, timeout):
+            return False
+        cache.delete(key)
+        return True
+
+    if attempt == attempts[-1]:
+        cache.delete(key)
+    return False
@@ -0,0 +1,91 @@
+import json
+import base64
+import binascii
+import operator
+from datetime import datetime
+from functools import reduce
+
+from django.db.models import Q
+from django.core.exceptions import ValidationError as DjangoValidationError
+
+from rest_framework.response import Response
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import BasePagination
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset pagination over the ordering of the queryset, newest first by default.
+
+    Each page is fetched with an index-friendly ``WHERE (created_at, id) < cursor`` filter
+    instead of an offset, so every page costs the same no matter how deep the client goes.
+    The cursor holds the values of the ordering fields of the last row, so the ordering
+    must end with a unique field, which ``KeysetOrderingFilter`` guarantees.
+    Pagination only kicks in when the client asks for it with ``?limit=`` or ``?cursor=``;
+    otherwise the full list is returned as before.
+    """
+
+    limit_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    default_limit = 100
+    max_limit = 1000
+    ordering = ('-created_at', '-id')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.limit_query_param not in request.query_params and self.cursor_query_param not in request.query_params:
+            return None
+
+        limit = self.get_limit(request)
+        ordering = list(queryset.query.order_by) or list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            values = self.decode_cursor(cursor, ordering, queryset.model)
+            queryset = queryset.filter(self.after(ordering, values))
+
+        page = list(queryset[: limit + 1])
+        self.next_cursor = self.encode_cursor(page[limit - 1], ordering) if len(page) > limit else None
+        return page[:limit]
+
+    def get_paginated_response(self, data):
+        return Response({'success': True, 'data': data, 'next': self.next_cursor})
+
+    def get_limit(self, request) -> int:
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except ValueError:
+            return self.default_limit
+        return min(max(limit, 1), self.max_limit)
+
+    @staticmethod
+    def after(ordering: list[str], values: list) -> Q:
+        """The rows that come after ``values`` in ``ordering``, e.g. ``a < x OR (a = x AND id < y)``."""
+        conditions, equal = [], {}
+        for field, value in zip(ordering, values, strict=True):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            conditions.append(Q(**equal, **{f'{name}__{lookup}': value}))
+            equal[name] = value
+        return reduce(operator.or_, conditions)
+
+    @staticmethod
+    def encode_cursor(instance, ordering: list[str]) -> str:
+        values = [getattr(instance, field.lstrip('-')) for field in ordering]
+        position = json.dumps([value.isoformat() if isinstance(value, datetime) else value for value in values])
+        return base64.urlsafe_b64encode(position.encode()).decode()
+
+    @staticmethod
+    def decode_cursor(cursor: str, ordering: list[str], model) -> list:
+        try:
+            values = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            if not isinstance(values, list) or len(values) != len(ordering):
+                msg = 'Invalid cursor'
+                raise ValidationError(msg)
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)  # noqa: SLF001
+                for field, value in zip(ordering, values, strict=True)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError, DjangoValidationError) as e:
+            msg = 'Invalid cursor'
+            raise ValidationError(msg) from e
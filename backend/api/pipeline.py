@@ -0,0 +1,101 @@
+import queue
+import logging
+import functools
+import threading
+import multiprocessing
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+import django
+from django.db import connection
+from django.conf import settings
+
+from .ingestion import iter_upload_chunks
+
+logger = logging.getLogger(__name__)
+
+_pool_lock = threading.Lock()
+
+
+@functools.cache
+def _create_parser_pool(max_workers: int) -> ProcessPoolExecutor:
+    # forking a Huey worker with several threads running is unsafe, so start clean interpreters
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup,
+    )
+
+
+def get_parser_pool() -> ProcessPoolExecutor:
+    """Return the process pool shared by every upload processed in this Huey consumer."""
+    with _pool_lock:
+        return _create_parser_pool(settings.VOTER_UPLOAD['PARSER_POOL_SIZE'])
+
+
+def ingest_pipelined(
+    file,
+    file_type: str,
+    chunk_size: int,
+    *,
+    start: int,
+    end: int | None,
+    added_by_id: str,
+    save_chunk: Callable[[pd.DataFrame, int, int], None],
+):
+    """
+    Ingest an upload with parsing and database writes running side by side.
+
+    The calling thread reads the file and submits chunks to the parser pool, where they are
+    parsed (CSV only) and validated. A writer thread takes the results in file order and
+    passes them to ``save_chunk``. At most ``PARSER_QUEUE_DEPTH`` chunks wait for the writer,
+    so reading pauses whenever the database falls behind.
+
+    Args:
+        file: A binary file handle of the upload.
+        file_type (str): The value returned by ``get_file_type``.
+        chunk_size (int): Maximum number of rows per chunk.
+        start (int): Offset of the shard to start from, see ``iter_upload_chunks``.
+        end (int | None): Offset the shard ends at.
+        added_by_id (str): Identifier of the admin who owns the upload.
+        save_chunk: Called in the writer thread with each chunk's prepared voters, invalid count
+            and end offset.
+    """
+    pool = get_parser_pool()
+    ready = queue.Queue(maxsize=settings.VOTER_UPLOAD['PARSER_QUEUE_DEPTH'])
+    errors = []
+    writer = threading.Thread(target=_write_chunks, args=(ready, save_chunk, errors), name='voter-writer')
+    writer.start()
+
+    try:
+        for prepare, chunk, offset in iter_upload_chunks(file, file_type, chunk_size, start, end):
+            if errors:
+                break
+            ready.put((pool.submit(prepare, chunk, added_by_id), offset))
+    except BrokenProcessPool:
+        _create_parser_pool.cache_clear()
+        raise
+    finally:
+        ready.put(None)
+        writer.join()
+
+    if errors:
+        raise errors[0]
+
+
+def _write_chunks(ready: queue.Queue, save_chunk: Callable[[pd.DataFrame, int, int], None], errors: list):
+    try:
+        while (item := ready.get()) is not None:
+            future, offset = item
+            if errors:
+                future.cancel()
+                continue
+            try:
+                save_chunk(*future.result(), offset)
+            except Exception as e:  # noqa: BLE001
+                errors.append(e)
+    finally:
+        connection.close()
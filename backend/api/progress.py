@@ -0,0 +1,206 @@
+import time
+import asyncio
+import logging
+from collections.abc import AsyncIterator
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import F
+from django.core.cache import cache
+
+from .models import VoterUpload
+from .versions import VOTERS, UPLOADS, bump_list_version
+from .renderers import render_json
+
+logger = logging.getLogger(__name__)
+
+PROGRESS_FIELDS = [
+    'status',
+    'processed_records',
+    'duplicate_records',
+    'dropped_records',
+    'invalid_records',
+    'total_records',
+    'reason',
+]
+FINISHED_STATUSES = ['completed', 'failed']
+HEARTBEAT_INTERVAL = 15  # seconds
+PROGRESS_TOKEN_SALT = 'api.progress.token'  # noqa: S105
+
+
+def _progress_key(upload_id: str) -> str:
+    return f'upload-progress:{upload_id}'
+
+
+def _store_progress(upload_id: str, progress: dict) -> dict:
+    progress['id'] = upload_id
+    progress['event_id'] = time.time_ns() // 1000  # microseconds still fit in a JavaScript number
+    cache.set(_progress_key(upload_id), progress, timeout=settings.VOTER_UPLOAD['PROGRESS_TTL'])
+    return progress
+
+
+def publish_progress(upload_id: str) -> dict:
+    """
+    Publish the current counters of an upload as its latest progress event.
+
+    Events live in the Django cache, so readers never touch the database while an upload is
+    running. Each event gets a new ``event_id`` that readers compare against the last one
+    they saw.
+    """
+    progress = VoterUpload.objects.values('user_id', *PROGRESS_FIELDS).get(id=upload_id)
+    return _store_progress(upload_id, progress)
+
+
+class ProgressCheckpoint:
+    """
+    Hold the counts of one shard in memory and write them to its upload now and then.
+
+    ``add`` is called once per committed chunk, and the counts are only flushed to the
+    database, the progress event and the logs when ``interval`` milliseconds have passed
+    since the last flush. Progress is therefore written once per chunk or once per interval,
+    whichever is rarer. Call ``flush`` when the shard is done so that nothing is left behind.
+
+    Args:
+        upload_id (str): The upload the counts belong to.
+        user_id (str): Identifier of the admin owning the upload.
+        interval (int): Minimum number of milliseconds between two flushes.
+    """
+
+    def __init__(self, upload_id: str, user_id: str, interval: int):
+        self.upload_id = upload_id
+        self.user_id = user_id
+        self.interval = interval / 1000
+        self.flushes = 0
+        self._last_flush = time.monotonic()
+        self._reset()
+
+    def _reset(self):
+        self.inserted = self.duplicates = self.dropped = self.invalid = 0
+
+    def add(self, inserted: int, duplicates: int, invalid: int, dropped: int = 0):
+        self.inserted += inserted
+        self.duplicates += duplicates
+        self.dropped += dropped
+        self.invalid += invalid
+        if time.monotonic() - self._last_flush >= self.interval:
+            self.flush()
+
+    def flush(self):
+        self._last_flush = time.monotonic()
+        if not (self.inserted or self.duplicates or self.invalid):
+            return
+
+        VoterUpload.objects.filter(id=self.upload_id).update(
+            processed_records=F('processed_records') + self.inserted,
+            duplicate_records=F('duplicate_records') + self.duplicates,
+            dropped_records=F('dropped_records') + self.dropped,
+            invalid_records=F('invalid_records') + self.invalid,
+        )
+        bump_list_version(UPLOADS, self.user_id)
+        if self.inserted:
+            bump_list_version(VOTERS, self.user_id)
+        publish_progress(self.upload_id)
+
+        logger.info(
+            f'Processed {self.inserted + self.duplicates + self.invalid} records of upload {self.upload_id}: '
+            f'{self.inserted} inserted, {self.duplicates} duplicates ({self.dropped} dropped before insert), '
+            f'{self.invalid} invalid'
+        )
+        self.flushes += 1
+        self._reset()
+
+
+def forget_progress(upload_id: str):
+    """Drop the progress event of a deleted upload, so readers find out it's gone."""
+    cache.delete(_progress_key(upload_id))
+
+
+async def aget_progress(upload_id: str) -> dict | None:
+    """Return the latest progress event of an upload, or ``None`` if the upload doesn't exist."""
+    progress = await cache.aget(_progress_key(upload_id))
+    if progress is not None:
+        return progress
+
+    # nothing published yet (or evicted): start from what the database has
+    progress = await VoterUpload.objects.filter(id=upload_id).values('user_id', *PROGRESS_FIELDS).afirst()
+    if progress is None:
+        return None
+    return _store_progress(upload_id, progress)
+
+
+async def await_progress(upload_id: str, after: int | None) -> dict | None:
+    """
+    Long-poll for the progress of an upload.
+
+    Returns as soon as the upload publishes an event other than ``after`` or finishes, and
+    at the latest after ``PROGRESS_LONG_POLL_TIMEOUT`` seconds. Returns ``None`` if the upload
+    is deleted meanwhile.
+    """
+    deadline = time.monotonic() + settings.VOTER_UPLOAD['PROGRESS_LONG_POLL_TIMEOUT']
+    progress = await aget_progress(upload_id)
+    while (
+        progress is not None
+        and progress['event_id'] == after
+        and progress['status'] not in FINISHED_STATUSES
+        and time.monotonic() < deadline
+    ):
+        await asyncio.sleep(settings.VOTER_UPLOAD['PROGRESS_POLL_INTERVAL'])
+        progress = await aget_progress(upload_id)
+    return progress
+
+
+async def iter_progress_events(upload_id: str, last_event_id: int | None) -> AsyncIterator[bytes]:
+    """
+    Yield the progress of an upload as server-sent events until it finishes.
+
+    The stream is closed after ``PROGRESS_STREAM_TIMEOUT`` seconds so that no connection is
+    held forever; ``EventSource`` reconnects on its own and sends back the last event id.
+    A comment is sent every ``HEARTBEAT_INTERVAL`` seconds to keep proxies from closing an
+    idle stream. The stream also ends if the upload is deleted, and reconnecting then gets a
+    ``404``.
+    """
+    deadline = time.monotonic() + settings.VOTER_UPLOAD['PROGRESS_STREAM_TIMEOUT']
+    heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+
+    while True:
+        progress = await aget_progress(upload_id)
+        if progress is None:
+            return
+        if progress['event_id'] != last_event_id:
+            last_event_id = progress['event_id']
+            heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+            data = render_json(public_progress(progress))
+            yield b'id: %d\nevent: progress\ndata: %s\n\n' % (last_event_id, data)
+        elif time.monotonic() >= heartbeat:
+            heartbeat = time.monotonic() + HEARTBEAT_INTERVAL
+            yield b': keep-alive\n\n'
+
+        if progress['status'] in FINISHED_STATUSES or time.monotonic() >= deadline:
+            return
+        await asyncio.sleep(settings.VOTER_UPLOAD['PROGRESS_POLL_INTERVAL'])
+
+
+def issue_progress_token(upload_id: str, user_id: str) -> str:
+    """
+    Sign a token that lets ``EventSource`` follow one upload of an admin.
+
+    ``EventSource`` can't send an ``Authorization`` header, so the token travels in the query
+    string, where it is written to access logs. It is therefore only valid for this upload
+    and for ``PROGRESS_TOKEN_TTL`` seconds, and never the admin's access token.
+    """
+    return signing.dumps({'upload': upload_id, 'user': user_id}, salt=PROGRESS_TOKEN_SALT)
+
+
+def read_progress_token(token: str, upload_id: str) -> str | None:
+    """Return the admin a progress token was issued to, or ``None`` if it expired or is for another upload."""
+    try:
+        payload = signing.loads(token, salt=PROGRESS_TOKEN_SALT, max_age=settings.VOTER_UPLOAD['PROGRESS_TOKEN_TTL'])
+    except signing.BadSignature:
+        return None
+    if payload.get('upload') != upload_id:
+        return None
+    return payload.get('user')
+
+
+def public_progress(progress: dict) -> dict:
+    return {field: progress[field] for field in ['id', 'event_id', *PROGRESS_FIELDS]}
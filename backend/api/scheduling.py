@@ -0,0 +1,43 @@
+from collections import Counter
+from collections.abc import Iterable
+
+from django.conf import settings
+
+
+def get_upload_priority(estimated_records: int | None) -> int:
+    """
+    Return the Huey priority of an upload's tasks from its estimated size.
+
+    Uploads fall in the first of ``PRIORITY_LANES`` whose row limit they fit in, so small
+    uploads are picked up before the shards of large ones; uploads of unknown size go to the
+    lowest lane.
+    """
+    if estimated_records is not None:
+        for max_records, priority in settings.VOTER_UPLOAD['PRIORITY_LANES']:
+            if estimated_records <= max_records:
+                return priority
+    return 0
+
+
+def pick_fair_share(
+    candidates: Iterable[tuple[str, str]], active: Counter, limit: int, per_admin: int
+) -> list[tuple[str, str]]:
+    """
+    Pick up to ``limit`` candidates without any admin going over ``per_admin`` active uploads.
+
+    Args:
+        candidates (Iterable[tuple[str, str]]): ``(upload_id, user_id)`` pairs in the order
+            they should be considered.
+        active (Counter): Number of uploads each admin already has running; updated with the
+            picked uploads.
+        limit (int): Maximum number of candidates to pick.
+        per_admin (int): Maximum number of active uploads per admin.
+    """
+    picked = []
+    for upload_id, user_id in candidates:
+        if len(picked) == limit:
+            break
+        if active[user_id] < per_admin:
+            active[user_id] += 1
+            picked.append((upload_id, user_id))
+    return picked
@@ -1,5 +1,7 @@
 from pathlib import Path
 
+from django.urls import reverse
+
 from rest_framework import serializers
 
 from .models import Voter, VoterUpload
@@ -16,6 +18,7 @@ class VerifyOTPSerializer(serializers.Serializer):
 
 class VoterUploadSerializer(serializers.ModelSerializer):
     file = serializers.SerializerMethodField()
+    rejected_file = serializers.SerializerMethodField()
 
     class Meta:
         model = VoterUpload
@@ -24,6 +27,10 @@ class VoterUploadSerializer(serializers.ModelSerializer):
             'file',
             'status',
             'processed_records',
+            'duplicate_records',
+            'dropped_records',
+            'invalid_records',
+            'rejected_file',
             'total_records',
             'created_at',
             'updated_at',
@@ -35,6 +42,11 @@ class VoterUploadSerializer(serializers.ModelSerializer):
     def get_file(self, instance):
         return Path(instance.file.name).name
 
+    def get_rejected_file(self, instance):
+        if not instance.rejected_file:
+            return None
+        return reverse('upload-rejected', args=[instance.id])
+
 
 class VoterSerializer(serializers.ModelSerializer):
     class Meta:
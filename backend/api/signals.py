@@ -0,0 +1,39 @@
+from django.dispatch import receiver
+from django.db.models.signals import post_save, post_delete
+
+from core.authentication import auth_cache
+
+from .stats import add_voter_counts
+from .models import Admin, Voter, VoterUpload
+from .progress import forget_progress
+from .versions import VOTERS, UPLOADS, bump_list_version
+
+
+@receiver(post_save, sender=Admin)
+@receiver(post_delete, sender=Admin)
+def invalidate_cached_admin(instance, **_kwargs):
+    auth_cache.invalidate(instance.id)
+
+
+# Voters have no delete receivers, which would make Django delete them one at a time.
+# VoterQuerySet.delete and Voter.delete recount and bump the version for deleted voters.
+@receiver(post_save, sender=Voter)
+def bump_voters_version(instance, **_kwargs):
+    bump_list_version(VOTERS, instance.added_by_id)
+
+
+@receiver(post_save, sender=Voter)
+def count_created_voter(instance, created, **_kwargs):
+    if created:
+        add_voter_counts({(instance.added_by_id, instance.department, instance.gender): 1})
+
+
+@receiver(post_save, sender=VoterUpload)
+@receiver(post_delete, sender=VoterUpload)
+def bump_uploads_version(instance, **_kwargs):
+    bump_list_version(UPLOADS, instance.user_id)
+
+
+@receiver(post_delete, sender=VoterUpload)
+def forget_upload_progress(instance, **_kwargs):
+    forget_progress(instance.id)
@@ -0,0 +1,153 @@
+import logging
+
+import pandas as pd
+import shortuuid
+
+from django.db import connection, transaction
+from django.db.models import Sum, Count
+from django.db.models.functions import Coalesce
+
+from .models import Voter, VoterCount, VoterUpload
+
+logger = logging.getLogger(__name__)
+
+GROUP_COLUMNS = ['added_by_id', 'department', 'gender']
+UPLOAD_RECORD_FIELDS = ['processed_records', 'duplicate_records', 'dropped_records', 'invalid_records']
+
+
+def add_voter_counts(counts: dict[tuple[str, str, str], int]):
+    """
+    Add voters to the counts of their groups, creating the groups that don't exist yet.
+
+    The counts are incremented by a single upsert, so concurrent shards never overwrite each
+    other's counts. Groups are upserted in a consistent order so that concurrent shards lock
+    their rows in the same order.
+
+    Args:
+        counts (dict): ``(added_by_id, department, gender)`` -> number of voters to add.
+    """
+    groups = sorted(group for group, count in counts.items() if count)
+    if not groups:
+        return
+
+    table = VoterCount._meta.db_table  # noqa: SLF001
+    values = ', '.join(['(%s, %s, %s, %s, %s)'] * len(groups))
+    params = [value for group in groups for value in (f'count_{shortuuid.uuid()}', *group, int(counts[group]))]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (id, added_by_id, department, gender, count) VALUES {values} '  # noqa: S608
+            f'ON CONFLICT (added_by_id, department, gender) DO UPDATE SET count = {table}.count + excluded.count',
+            params,
+        )
+
+
+def count_inserted_voters(voters: pd.DataFrame, inserted: int):
+    """
+    Add the voters of a chunk that were inserted to the counts, in the inserting transaction.
+
+    Args:
+        voters (pd.DataFrame): The voters given to the loader.
+        inserted (int): How many of them the database accepted.
+    """
+    if not inserted:
+        return
+
+    if inserted == len(voters):
+        counts = voters.groupby(GROUP_COLUMNS).size().to_dict()
+    else:
+        # some rows conflicted, only the ones that landed are counted
+        groups = Voter.objects.filter(id__in=voters['id'].tolist()).values_list(*GROUP_COLUMNS)
+        counts = {tuple(group): count for *group, count in groups.annotate(count=Count('id')).order_by()}
+    add_voter_counts(counts)
+
+
+def _lock_voter_counts():
+    """Wait for the transactions inserting voters and hold off new ones until the current transaction ends."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {VoterCount._meta.db_table} IN SHARE ROW EXCLUSIVE MODE')  # noqa: SLF001
+
+
+def recount_voter_groups(groups: set[tuple[str, str, str]]):
+    """
+    Recount some groups from the voters table, e.g. after voters of them were deleted.
+
+    Runs in the caller's transaction and locks the counts table like ``rebuild_voter_counts``,
+    so voters inserted meanwhile are neither lost nor counted twice.
+
+    Args:
+        groups (set): ``(added_by_id, department, gender)`` of the groups to recount.
+    """
+    if not groups:
+        return
+
+    with transaction.atomic():
+        _lock_voter_counts()
+        for admin_id, department, gender in sorted(groups):
+            group = {'added_by_id': admin_id, 'department': department, 'gender': gender}
+            VoterCount.objects.filter(**group).update(count=Voter.objects.filter(**group).count())
+
+
+def rebuild_voter_counts(admin_id: str | None = None) -> int:
+    """
+    Recount the voters of every group from the voters table, e.g. after voters were edited.
+
+    On PostgreSQL the counts table is locked first, which waits for the transactions that are
+    inserting voters and holds off new ones until the rebuild commits, so no voters are
+    counted twice or missed while uploads are running.
+
+    Args:
+        admin_id (str | None): Only rebuild the counts of this admin.
+
+    Returns:
+        int: The number of groups.
+    """
+    voters = Voter.objects.all()
+    counts = VoterCount.objects.all()
+    if admin_id is not None:
+        voters = voters.filter(added_by_id=admin_id)
+        counts = counts.filter(added_by_id=admin_id)
+
+    with transaction.atomic():
+        _lock_voter_counts()
+        counts.delete()
+
+        groups = voters.values(*GROUP_COLUMNS).annotate(count=Count('id')).order_by()
+        created = VoterCount.objects.bulk_create(
+            [VoterCount(id=f'count_{shortuuid.uuid()}', **group) for group in groups.iterator()], batch_size=1000
+        )
+
+    logger.info(f'Rebuilt {len(created)} voter counts{f" of {admin_id}" if admin_id else ""}')
+    return len(created)
+
+
+def get_voter_stats(admin_id: str) -> dict:
+    """
+    Summarize the voters and uploads of an admin for dashboards.
+
+    Voters are counted from ``VoterCount``, so this reads one row per department and gender
+    however many voters there are. Upload totals are summed over the admin's uploads.
+    """
+    departments, genders, total = {}, {}, 0
+    groups = VoterCount.objects.filter(added_by_id=admin_id, count__gt=0).values_list('department', 'gender', 'count')
+    for department, gender, count in groups:
+        summary = departments.setdefault(department, {'department': department, 'total': 0, 'genders': {}})
+        summary['total'] += count
+        summary['genders'][gender] = count
+        genders[gender] = genders.get(gender, 0) + count
+        total += count
+
+    uploads = VoterUpload.objects.filter(user_id=admin_id)
+    statuses = dict(uploads.values_list('status').annotate(count=Count('id')).order_by())
+    records = uploads.aggregate(**{field: Coalesce(Sum(field), 0) for field in UPLOAD_RECORD_FIELDS})
+
+    return {
+        'total_voters': total,
+        'genders': genders,
+        'departments': sorted(departments.values(), key=lambda summary: (-summary['total'], summary['department'])),
+        'uploads': {
+            'total': sum(statuses.values()),
+            **{status: statuses.get(status, 0) for status, _ in VoterUpload.STATUS_CHOICES},
+            **records,
+        },
+    }
@@ -0,0 +1,43 @@
+from collections.abc import Iterator, AsyncIterator
+
+from asgiref.sync import sync_to_async
+
+from django.core.handlers.asgi import ASGIRequest
+
+_DONE = object()
+
+
+def is_asgi(request) -> bool:
+    """Whether a request (Django's or DRF's) is being served by an ASGI server."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def aiterate(iterator: Iterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Yield the pieces of a synchronous iterator, producing them one at a time in the request's thread.
+
+    Each ``next`` runs through ``sync_to_async``, which keeps it on the thread the view ran
+    in, so database cursors opened by the iterator stay on their connection. The iterator is
+    closed when the stream ends or the client goes away, releasing server-side cursors.
+    """
+    next_piece = sync_to_async(next)
+    try:
+        while (piece := await next_piece(iterator, _DONE)) is not _DONE:
+            yield piece
+    finally:
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def streaming_content(request, content: Iterator[bytes]) -> Iterator[bytes] | AsyncIterator[bytes]:
+    """
+    Make the content of a ``StreamingHttpResponse`` stream under both WSGI and ASGI.
+
+    Under ASGI, Django serves a synchronous iterator by reading all of it into a list before
+    the first byte is sent, so the content is handed over as an asynchronous iterator
+    instead. WSGI servers consume synchronous iterators lazily and get ``content`` as is.
+    """
+    if is_asgi(request):
+        return aiterate(content)
+    return content
@@ -1,4 +1,13 @@
+import math
+import time
+import uuid
+import random
 import logging
+import tempfile
+from datetime import timedelta
+from functools import partial
+from collections import Counter
+from collections.abc import Callable
 
 import pandas as pd
 import requests
@@ -6,155 +15,511 @@ import shortuuid
 from huey import crontab
 from huey.contrib.djhuey import task, db_task, lock_task, db_periodic_task
 
-from django.db import transaction
+from django.db import OperationalError, connection, transaction
 from django.conf import settings
-from django.core.exceptions import ValidationError
+from django.utils import timezone
+from django.db.models import F, Q, Sum, Count, Exists, OuterRef
+from django.core.files import File
 
-from .models import Voter, VoterUpload
+from .stats import count_inserted_voters
+from .dedupe import DuplicateFilter, shared_duplicate_filter
+from .emails import is_retryable, render_email, get_retry_delay, get_email_backend
+from .models import UploadShard, VoterUpload, RejectedChunk
+from .loaders import get_voter_loader
+from .pipeline import ingest_pipelined
+from .progress import ProgressCheckpoint, publish_progress
+from .versions import UPLOADS, bump_list_version
+from .ingestion import REQUIRED_COLUMNS, get_file_type, plan_csv_shards, count_upload_rows, iter_upload_chunks
+from .scheduling import pick_fair_share, get_upload_priority
 
 logger = logging.getLogger(__name__)
 
-BATCH_SIZE = 1000
-PROGRESS_UPDATE_COUNT = 20
-REQUIRED_COLUMNS = ['email', 'gender', 'full_name', 'department', 'matriculation_number']
+DEADLOCK_RETRIES = 5
+DEADLOCK_DETECTED = '40P01'  # PostgreSQL error code
+REJECTED_COLUMNS = [*REQUIRED_COLUMNS, 'reason']
+REJECTED_FILE_MEMORY_SIZE = 8_388_608  # rejected rows reports larger than 8MB are spooled to disk
+CLAIM_SCAN_FACTOR = 10  # pending uploads looked at per upload to claim, to get past admins at their limit
 
 
 @db_periodic_task(crontab(minute='*/1'))
 @lock_task('fetch-all-pending-uploads-lock')
 def fetch_all_pending_uploads():
     try:
-        pending_uploads = VoterUpload.objects.filter(status='pending')
-        for upload in pending_uploads:
-            logger.info(f'Initiating processing for upload {upload.id}')
-            process_upload.schedule((upload.id,), delay=1)
-            upload.status = 'processing'
-            upload.save(update_fields=['status'])
+        reap_stale_uploads()
+        dispatch_pending_uploads()
     except Exception:
         logger.exception('Error in fetch_all_pending_uploads')
 
 
-@db_task()
-def process_upload(upload_id: str):
-    upload = VoterUpload.objects.get(id=upload_id)
-    logger.info(f'Processing upload {upload_id}')
+def dispatch_pending_uploads(limit: int | None = None, upload_ids: list[str] | None = None) -> list[str]:
+    """
+    Claim pending uploads with ``claim_pending_uploads`` and enqueue them in their priority lane.
 
-    try:
-        file_extension = upload.file.name.split('.')[-1].lower()
+    Runs every minute, and whenever an upload finishes so that the admin's next upload
+    doesn't wait for the next run. ``limit`` defaults to ``CLAIM_BATCH_SIZE``.
 
-        if file_extension == 'csv':
-            df = pd.read_csv(upload.file)
-        elif file_extension in ['xls', 'xlsx']:
-            df = pd.read_excel(upload.file)
+    Uploads that can't be enqueued, e.g. while the queue's Redis is down, go back to pending
+    for a later run instead of failing the caller. Returns the uploads that were enqueued.
+    """
+    claimed = claim_pending_uploads(limit or settings.VOTER_UPLOAD['CLAIM_BATCH_SIZE'], upload_ids=upload_ids)
+    dispatched, undelivered = [], []
+    for upload_id, priority in claimed:
+        logger.info(f'Initiating processing for upload {upload_id} with priority {priority}')
+        try:
+            process_upload(upload_id, priority=priority)
+        except Exception:
+            logger.exception(f'Could not enqueue upload {upload_id}, returning it to pending')
+            undelivered.append(upload_id)
         else:
-            msg = f'Unsupported file type: {file_extension}'
-            raise ValueError(msg)
-
-        if set(REQUIRED_COLUMNS) != set(df.columns):
-            msg = f"Column mismatch. Expected: {', '.join(REQUIRED_COLUMNS)}"
-            raise ValueError(msg)
-
-        valid_records = 0
-        voters_to_create = []
-        total_records = len(df)
-
-        upload.total_records = total_records
-        upload.save(update_fields=['total_records'])
-
-        for index, row in df.iterrows():
-            try:
-                voter_data = {
-                    'email': row['email'],
-                    'gender': row['gender'],
-                    'added_by_id': upload.user.id,
-                    'full_name': row['full_name'],
-                    'department': row['department'],
-                    'id': f'voter_{shortuuid.uuid()}',
-                    'matriculation_number': str(row['matriculation_number']),
-                }
-
-                voters_to_create.append(Voter(**voter_data))
-
-                if len(voters_to_create) >= BATCH_SIZE:
-                    valid_records += batch_create_voters(voters_to_create)
-                    voters_to_create = []
-
-                if (index + 1) % PROGRESS_UPDATE_COUNT == 0:
-                    logger.info(f'Processed {index + 1} records for upload {upload.id}')
-                    upload.processed_records = valid_records
-                    upload.save(update_fields=['processed_records'])
-
-            except ValidationError as e:
-                logger.warning(f'Invalid data in row {index + 1} of upload {upload.id}: {e!s}')
-
-        if voters_to_create:
-            valid_records += batch_create_voters(voters_to_create)
-
-        upload.processed_records = valid_records
-        upload.status = 'completed'
-        upload.save(update_fields=['processed_records', 'status'])
-
-        send_email(
-            to=upload.user.email,
-            subject='Voter Upload Processed Successfully',
-            html=f"""
-            <html>
-                <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-                    <h2>Voter Upload Processed Successfully</h2>
-                    <p>Your voter upload has been processed successfully. Here are the details:</p>
-                    <ul>
-                        <li><strong>Upload ID:</strong> {upload_id}</li>
-                        <li><strong>File Name:</strong> {upload.file.name}</li>
-                        <li><strong>Total Records:</strong> {total_records}</li>
-                        <li><strong>Valid Records Processed:</strong> {valid_records}</li>
-                        <li><strong>Invalid Records:</strong> {total_records - valid_records}</li>
-                    </ul>
-                    <p>If you have any questions or concerns, please contact our support team.</p>
-                    <p>Thank you for using our service!</p>
-                </body>
-            </html>
-            """,
+            dispatched.append(upload_id)
+
+    release_claimed_uploads(undelivered)
+    return dispatched
+
+
+def release_claimed_uploads(upload_ids: list[str]):
+    """Return claimed uploads whose ``process_upload`` never started to pending."""
+    if not upload_ids:
+        return
+
+    with transaction.atomic():
+        released = VoterUpload.objects.filter(id__in=upload_ids, status='processing', heartbeat_at=None)
+        user_ids = set(released.values_list('user_id', flat=True))
+        released.update(status='pending')
+        for user_id in user_ids:
+            bump_list_version(UPLOADS, user_id)
+
+
+def claim_pending_uploads(limit: int, upload_ids: list[str] | None = None) -> list[tuple[str, int]]:
+    """
+    Mark up to ``limit`` pending uploads as processing and return their ids and priorities.
+
+    The uploads are claimed in one transaction with ``SELECT ... FOR UPDATE SKIP LOCKED`` and
+    a single ``UPDATE``, so several schedulers (or a scheduler and an upload request) never
+    claim the same upload twice, and a claimed upload is committed before it is dispatched.
+
+    Smaller uploads are claimed first, and no admin gets more than ``MAX_ACTIVE_PER_ADMIN``
+    uploads processing at once, so one admin's large files can't take every worker. The
+    per-admin limit is best effort when several schedulers claim at the same moment.
+
+    Args:
+        limit (int): Maximum number of uploads to claim.
+        upload_ids (list[str] | None): Only consider these uploads.
+    """
+    with transaction.atomic():
+        pending = VoterUpload.objects.select_for_update(skip_locked=True).filter(status='pending')
+        if upload_ids is not None:
+            pending = pending.filter(id__in=upload_ids)
+        pending = pending.order_by(F('estimated_records').asc(nulls_last=True), 'created_at')
+        candidates = pending.values_list('id', 'user_id', 'estimated_records')[: limit * CLAIM_SCAN_FACTOR]
+        estimated_records = {upload_id: estimated for upload_id, _, estimated in candidates}
+
+        active = Counter(
+            dict(
+                VoterUpload.objects.filter(status='processing')
+                .values('user_id')
+                .annotate(count=Count('id'))
+                .values_list('user_id', 'count')
+            )
+        )
+        claimed = pick_fair_share(
+            ((upload_id, user_id) for upload_id, user_id, _ in candidates),
+            active,
+            limit=limit,
+            per_admin=settings.VOTER_UPLOAD['MAX_ACTIVE_PER_ADMIN'],
         )
 
-        logger.info(
-            f'Completed processing upload {upload_id}. '
-            f'Total records: {total_records}, Valid records: {valid_records}'
+        # the heartbeat is only set once process_upload starts, so an upload waiting in the queue never looks stale
+        VoterUpload.objects.filter(id__in=[upload_id for upload_id, _ in claimed], status='pending').update(
+            status='processing', heartbeat_at=None, claimed_at=timezone.now()
         )
+        for user_id in {user_id for _, user_id in claimed}:
+            bump_list_version(UPLOADS, user_id)
+
+    return [(upload_id, get_upload_priority(estimated_records[upload_id])) for upload_id, _ in claimed]
+
+
+def lock_unplanned_upload(upload_id: str) -> VoterUpload | None:
+    """
+    Lock a processing upload that has no shards yet, in the current transaction.
+
+    Returns ``None`` if the upload is no longer processing, already has its shards, or is
+    locked by another task planning it.
+    """
+    unplanned = VoterUpload.objects.select_for_update(skip_locked=True).filter(
+        ~Exists(UploadShard.objects.filter(upload=OuterRef('pk'))), id=upload_id, status='processing'
+    )
+    return unplanned.first()
+
+
+def get_shard_count(file_size: int) -> int:
+    """How many shards a CSV file is split into: one per ``SHARD_SIZE`` bytes, up to ``MAX_SHARDS``."""
+    # SQLite serializes writers, so shards would only wait on each other's locks
+    if connection.vendor == 'sqlite':
+        return 1
+    shard_count = math.ceil(file_size / settings.VOTER_UPLOAD['SHARD_SIZE'])
+    return min(max(shard_count, 1), settings.VOTER_UPLOAD['MAX_SHARDS'])
+
+
+@db_task()
+def process_upload(upload_id: str):
+    """
+    Plan the shards of a claimed upload and enqueue them.
+
+    The upload's heartbeat is set as the task starts, which tells ``reap_stale_uploads`` that
+    it left the queue. Planning then runs with the upload's row locked, so the reaper leaves
+    it alone however long the file takes to read, and a duplicate task for the same upload
+    skips it instead of planning a second set of shards.
+
+    The shards are saved along with the row count, so an upload that was interrupted after
+    this point is resumed shard by shard by ``reap_stale_uploads`` instead of starting over.
+    """
+    with transaction.atomic():
+        if lock_unplanned_upload(upload_id) is None:
+            logger.info(f'Skipping upload {upload_id}: not processing, already planned or being planned')
+            return
+        VoterUpload.objects.filter(id=upload_id).update(heartbeat_at=timezone.now())
+
+    try:
+        with transaction.atomic():
+            upload = lock_unplanned_upload(upload_id)
+            if upload is None:
+                logger.info(f'Skipping upload {upload_id}: not processing, already planned or being planned')
+                return
+            logger.info(f'Processing upload {upload_id}')
+
+            file_type = get_file_type(upload)
+            with upload.file.open('rb') as file:
+                if file_type == 'csv':
+                    upload.total_records, ranges = plan_csv_shards(file, get_shard_count(upload.file.size))
+                else:
+                    upload.total_records = count_upload_rows(file, file_type)
+                    ranges = [(0, None)]  # Excel files are read as a whole and resumed by row
+
+            shards = [
+                UploadShard(
+                    id=f'shard_{shortuuid.uuid()}',
+                    upload=upload,
+                    start=start,
+                    end=end,
+                    offset=start,
+                    lease=uuid.uuid4().hex,
+                )
+                for start, end in ranges
+            ]
+            upload.shard_count = len(shards)
+            upload.heartbeat_at = timezone.now()
+            upload.save(update_fields=['total_records', 'shard_count', 'heartbeat_at'])
+            UploadShard.objects.bulk_create(shards)
+        publish_progress(upload_id)
     except Exception as e:
         logger.exception(f'Error processing upload {upload_id}')
-        upload.status = 'failed'
-        upload.reason = str(e)
-        upload.save(update_fields=['status', 'reason'])
+        VoterUpload.objects.filter(id=upload_id).update(status='failed', reason=str(e))
+        bump_list_version(UPLOADS, publish_progress(upload_id)['user_id'])
+        dispatch_pending_uploads()
+        return
+
+    if len(shards) == 1:
+        process_upload_shard.call_local(shards[0].id, shards[0].lease)
+        return
+
+    # the shards stay in the upload's lane, so small uploads still get ahead of a large one's shards
+    priority = get_upload_priority(upload.total_records)
+    logger.info(f'Splitting upload {upload_id} into {len(shards)} shards with priority {priority}')
+    for shard in shards:
+        process_upload_shard(shard.id, shard.lease, priority=priority)
+
 
+class LeaseLostError(Exception):
+    """Raised when another task took over the shard being processed."""
 
-@task()
-def send_email(to: str, subject: str, html: str) -> dict:
+
+@db_task()
+def process_upload_shard(shard_id: str, lease: str):
     """
-    Send an email using the Plunk API.
+    Ingest one shard of an upload from its last checkpoint and add its counts to the upload.
+
+    The task only runs while ``lease`` is the shard's current lease, which ``reap_stale_uploads``
+    replaces when the shard stops showing signs of life. Every chunk moves the shard's offset
+    and counts in the same transaction as its voters, so a resumed shard neither skips nor
+    inserts a chunk twice. The shard that finishes last schedules ``finalize_upload``.
+    """
+    if not UploadShard.objects.filter(id=shard_id, lease=lease, completed=False).update(heartbeat_at=timezone.now()):
+        logger.info(f'Shard {shard_id} was taken over or is done, skipping')
+        return
+
+    shard = UploadShard.objects.select_related('upload').get(id=shard_id)
+    upload = shard.upload
+    file_type = get_file_type(upload)
+    chunk_size = settings.VOTER_UPLOAD['CHUNK_SIZE']
+    checkpoint = ProgressCheckpoint(upload.id, upload.user_id, settings.VOTER_UPLOAD['PROGRESS_FLUSH_INTERVAL'])
+    if shard.offset != shard.start:
+        logger.info(f'Resuming shard {shard_id} of upload {upload.id} at offset {shard.offset}')
+
+    try:
+        with (
+            upload.file.open('rb') as file,
+            shared_duplicate_filter(upload.id, expected_rows=upload.total_records or 0) as duplicates,
+        ):
+            save_chunk = partial(save_upload_chunk, checkpoint, shard, duplicates=duplicates)
+            if settings.VOTER_UPLOAD['PARSER_POOL_SIZE']:
+                ingest_pipelined(
+                    file,
+                    file_type,
+                    chunk_size,
+                    start=shard.offset,
+                    end=shard.end,
+                    added_by_id=upload.user_id,
+                    save_chunk=save_chunk,
+                )
+            else:
+                for prepare, chunk, offset in iter_upload_chunks(file, file_type, chunk_size, shard.offset, shard.end):
+                    save_chunk(*prepare(chunk, upload.user_id), offset)
+    except LeaseLostError:
+        logger.warning(f'Lost the lease on shard {shard_id} of upload {upload.id}, stopping')
+        checkpoint.flush()
+        return
+    except Exception as e:
+        logger.exception(f'Error processing upload {upload.id}')
+        VoterUpload.objects.filter(id=upload.id).update(status='failed', reason=str(e))
+        bump_list_version(UPLOADS, upload.user_id)
+        publish_progress(upload.id)
+
+    checkpoint.flush()
+    with transaction.atomic():
+        if not UploadShard.objects.filter(id=shard_id, lease=lease, completed=False).update(completed=True):
+            logger.warning(f'Lost the lease on shard {shard_id} of upload {upload.id} before completing it')
+            return
+        VoterUpload.objects.filter(id=upload.id).update(completed_shards=F('completed_shards') + 1)
+        completed_shards = VoterUpload.objects.values_list('completed_shards', flat=True).get(id=upload.id)
+
+    if completed_shards == upload.shard_count:
+        finalize_upload(upload.id)
+
+
+def save_upload_chunk(
+    checkpoint: ProgressCheckpoint,
+    shard: UploadShard,
+    voters: pd.DataFrame,
+    rejected: pd.DataFrame,
+    offset: int,
+    *,
+    duplicates: DuplicateFilter,
+):
+    """
+    Insert one chunk of prepared voters, keep its rejected rows and move the shard's checkpoint past it.
+
+    Voters known to be duplicates are dropped by ``duplicates`` first and counted as such.
+    Raises ``LeaseLostError``, rolling the chunk back, if the shard was taken over by another task.
+    """
+    candidates, dropped = duplicates.drop_duplicates(voters)
+    invalid = len(rejected)
+
+    def advance_shard(inserted: int):
+        updated = UploadShard.objects.filter(id=shard.id, lease=shard.lease).update(
+            offset=offset,
+            inserted_records=F('inserted_records') + inserted,
+            duplicate_records=F('duplicate_records') + len(voters) - inserted,
+            dropped_records=F('dropped_records') + dropped,
+            invalid_records=F('invalid_records') + invalid,
+            heartbeat_at=timezone.now(),
+        )
+        if not updated:
+            raise LeaseLostError(shard.id)
+        if invalid:
+            RejectedChunk.objects.create(shard=shard, offset=offset, rows=rejected.to_csv(header=False, index=False))
+
+    inserted = batch_create_voters(candidates, before_commit=advance_shard)
+    duplicates.add(candidates, inserted)
+    checkpoint.add(inserted=inserted, duplicates=len(voters) - inserted, invalid=invalid, dropped=dropped)
+
+
+def reap_stale_uploads():
+    """
+    Resume the uploads whose tasks stopped showing signs of life for ``LEASE_TIMEOUT`` seconds.
+
+    Uploads whose ``process_upload`` started but died before their shards were planned go back
+    to pending, and so do uploads whose ``process_upload`` hasn't started ``QUEUE_TIMEOUT``
+    seconds after they were claimed, whose message was presumably lost; the dispatcher then
+    enqueues them again. An upload being planned is locked and skipped. Shards that were
+    started but haven't checkpointed in time get a new lease, which stops their old task if
+    it's still around, and are enqueued again to resume from their last offset. Shards whose
+    task hasn't started yet are left to the queue.
+    """
+    now = timezone.now()
+    stale_before = now - timedelta(seconds=settings.VOTER_UPLOAD['LEASE_TIMEOUT'])
+    lost_before = now - timedelta(seconds=settings.VOTER_UPLOAD['QUEUE_TIMEOUT'])
+
+    with transaction.atomic():
+        unplanned = VoterUpload.objects.select_for_update(skip_locked=True).filter(
+            Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at=None, claimed_at__lt=lost_before),
+            ~Exists(UploadShard.objects.filter(upload=OuterRef('pk'))),
+            status='processing',
+        )
+        unplanned = list(unplanned.values_list('id', 'user_id'))
+        VoterUpload.objects.filter(id__in=[upload_id for upload_id, _ in unplanned], status='processing').update(
+            status='pending'
+        )
+        for user_id in {user_id for _, user_id in unplanned}:
+            bump_list_version(UPLOADS, user_id)
+    for upload_id, _ in unplanned:
+        logger.warning(f'Upload {upload_id} stopped or was lost before it was planned, returning it to pending')
+
+    stale = UploadShard.objects.filter(
+        upload__status='processing', completed=False, heartbeat_at__lt=stale_before
+    ).values_list('id', 'lease', 'upload_id', 'upload__total_records')
+    for shard_id, lease, upload_id, total_records in stale:
+        new_lease = uuid.uuid4().hex
+        if not UploadShard.objects.filter(id=shard_id, lease=lease).update(lease=new_lease, heartbeat_at=None):
+            continue
+        logger.warning(f'Shard {shard_id} of upload {upload_id} went stale, resuming it')
+        process_upload_shard(shard_id, new_lease, priority=get_upload_priority(total_records))
+
+
+@db_task()
+def finalize_upload(upload_id: str):
+    """Mark an upload whose shards have all finished as completed and notify its owner."""
+    upload = VoterUpload.objects.select_related('user').get(id=upload_id)
+    if upload.status == 'failed':
+        dispatch_pending_uploads()
+        return
+
+    # the shards' checkpoints are exact, the counters flushed to the upload may miss an interrupted run's last chunks
+    totals = upload.shards.aggregate(
+        valid_records=Sum('inserted_records'),
+        duplicate_records=Sum('duplicate_records'),
+        dropped_records=Sum('dropped_records'),
+        invalid_records=Sum('invalid_records'),
+    )
+    valid_records = totals['valid_records'] or 0
+    duplicate_records = totals['duplicate_records'] or 0
+    dropped_records = totals['dropped_records'] or 0
+    invalid_records = totals['invalid_records'] or 0
+    total_records = valid_records + duplicate_records + invalid_records
+
+    upload.processed_records = valid_records
+    upload.duplicate_records = duplicate_records
+    upload.dropped_records = dropped_records
+    upload.invalid_records = invalid_records
+    upload.total_records = total_records
+    upload.status = 'completed'
+    if invalid_records:
+        save_rejected_file(upload)
+    upload.save(
+        update_fields=[
+            'rejected_file',
+            'processed_records',
+            'duplicate_records',
+            'dropped_records',
+            'invalid_records',
+            'total_records',
+            'status',
+        ]
+    )
+    publish_progress(upload_id)
+
+    send_email(
+        to=upload.user.email,
+        template='upload_completed',
+        context={
+            'upload_id': upload_id,
+            'file_name': upload.file.name,
+            'total_records': total_records,
+            'valid_records': valid_records,
+            'duplicate_records': duplicate_records,
+            'dropped_records': dropped_records,
+            'invalid_records': invalid_records,
+        },
+    )
+
+    logger.info(
+        f'Completed processing upload {upload_id}. '
+        f'Total records: {total_records}, Valid records: {valid_records}, '
+        f'Duplicate records: {duplicate_records} ({dropped_records} dropped before insert), '
+        f'Invalid records: {invalid_records}'
+    )
+    dispatch_pending_uploads()
+
+
+def save_rejected_file(upload: VoterUpload):
+    """Assemble the rejected rows kept by the shards of an upload into its ``rejected_file``, in file order."""
+    chunks = (
+        RejectedChunk.objects.filter(shard__upload=upload)
+        .order_by('shard__start', 'offset')
+        .values_list('rows', flat=True)
+    )
+    with tempfile.SpooledTemporaryFile(max_size=REJECTED_FILE_MEMORY_SIZE) as report:
+        report.write(f'{",".join(REJECTED_COLUMNS)}\n'.encode())
+        for rows in chunks.iterator():
+            report.write(rows.encode())
+        upload.rejected_file.save(f'{upload.id}.csv', File(report), save=False)
+
+    RejectedChunk.objects.filter(shard__upload=upload).delete()
+
+
+@task(retries=settings.EMAIL['RETRIES'], context=True)
+def send_email(to: str | list[str], template: str, context: dict, task=None):
+    """
+    Render an email template and send it with the configured backend, see ``api.emails``.
+
+    Rendering happens here in the worker, so callers such as request handlers only pay for
+    enqueueing the task.
+
+    Deliveries that time out, can't connect or are throttled are retried by Huey up to
+    ``EMAIL['RETRIES']`` times with an exponential backoff; other failures are logged.
 
     Args:
         to (str or list): The recipient's email address(es).
-        subject (str): The subject of the email.
-        html (str): The HTML content of the email.
+        template (str): A key of ``EMAIL_TEMPLATES``.
+        context (dict): The variables used by the template.
     """
+    subject, html = render_email(template, context)
     logger.info(f'Sending email to {to} with subject: {subject}')
 
-    url = 'https://api.useplunk.com/v1/send'
-    headers = {'Authorization': f'Bearer {settings.PLUNK_API_KEY}', 'Content-Type': 'application/json'}
+    try:
+        get_email_backend().send(to=to, subject=subject, html=html)
+    except requests.RequestException as e:
+        if task is None or not task.retries or not is_retryable(e):
+            logger.exception(f'Failed to send email to {to}')
+            return
+        attempt = settings.EMAIL['RETRIES'] - task.retries + 1
+        task.retry_delay = get_retry_delay(attempt)  # read by Huey when it schedules the retry
+        logger.warning(f'Failed to send email to {to}, retry {attempt} in {task.retry_delay}s: {e}')
+        raise
+
+    logger.info(f'Email sent successfully to {to}')
 
-    payload = {
-        'subject': subject,
-        'body': html,
-        'to': to,
-    }
 
-    try:
-        response = requests.post(url, json=payload, headers=headers, timeout=15)
-        response.raise_for_status()
-        logger.info(f'Email sent successfully to {to}')
-    except requests.RequestException:
-        logger.exception('Failed to send email')
+def batch_create_voters(voters: pd.DataFrame, before_commit: Callable[[int], None] | None = None) -> int:
+    """
+    Insert a frame of prepared voters with the loader suited to the configured database.
+
+    The voter counts of the dashboards are updated in the same transaction. Shards of the
+    same upload insert concurrently and may deadlock on the unique indexes when they carry
+    the same emails or matriculation numbers, in which case the batch is retried.
+
+    Args:
+        voters (pd.DataFrame): Voters prepared by ``prepare_voters``.
+        before_commit: Called with the number of inserted voters inside the inserting
+            transaction, e.g. to checkpoint alongside the insert. Raising rolls the insert back.
+    """
+    load_voters = get_voter_loader()
+
+    def load():
+        with transaction.atomic():
+            inserted = load_voters(voters)
+            count_inserted_voters(voters, inserted)
+            if before_commit is not None:
+                before_commit(inserted)
+            return inserted
 
+    for attempt in range(1, DEADLOCK_RETRIES):
+        try:
+            return load()
+        except OperationalError as e:
+            if getattr(e.__cause__, 'pgcode', None) != DEADLOCK_DETECTED:
+                raise
+            logger.warning(f'Deadlock while inserting voters, retrying (attempt {attempt})')
+            time.sleep(random.uniform(0.05, 0.2) * attempt)  # noqa: S311
 
-@transaction.atomic
-def batch_create_voters(voters):
-    return len(Voter.objects.bulk_create(voters, ignore_conflicts=True))
+    return load()
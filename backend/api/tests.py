@@ -1,3 +1,650 @@
-from django.test import TestCase
+import io
+import gzip
+import time
+from datetime import timedelta
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
 
-# Create your tests here.
+import redis
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+from asgiref.sync import async_to_sync, sync_to_async
+from huey.contrib.djhuey import HUEY
+
+from django.db import connection, transaction
+from django.test import RequestFactory
+from django.urls import reverse
+from django.utils import timezone
+from django.core.cache import cache
+from django.utils.http import http_date
+from django.core.management import call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+
+from rest_framework.test import APIClient
+from rest_framework.request import Request
+from rest_framework.exceptions import AuthenticationFailed
+
+from core import authentication
+from core.authentication import JWTAuthentication, auth_cache
+
+from api import tasks, views
+from api.otp import OTP_KEY_PREFIX, issue_otp, verify_otp
+from api.tasks import (
+    process_upload,
+    save_upload_chunk,
+    reap_stale_uploads,
+    process_upload_shard,
+    claim_pending_uploads,
+    dispatch_pending_uploads,
+)
+from api.utils import generate_access_token
+from api.views import VotersAPIView
+from api.emails import MemoryBackend, get_email_backend
+from api.models import Admin, Voter, VoterCount, UploadShard, VoterUpload
+from api.exports import EXPORT_COLUMNS, iter_voter_frames
+from api.loaders import get_voter_loader
+from api.pipeline import get_parser_pool
+from api.progress import await_progress, publish_progress, iter_progress_events
+from api.versions import UPLOADS, get_list_version
+from api.ingestion import REQUIRED_COLUMNS, CSV_MAX_QUOTED_LINES, prepare_voters, iter_csv_blocks, parse_csv_block
+from api.pagination import KeysetPagination
+
+from benchmarks.scheduling import Job, simulate, make_jobs, percentile, make_parser
+
+pytestmark = pytest.mark.django_db(transaction=True)
+
+CHUNK_SIZE = 4
+
+
+class WorkerDiedError(BaseException):
+    """Stands for a worker killed in the middle of a shard, which no ``except Exception`` catches."""
+
+
+def voter_row(number: int, department: str = 'Physics', gender: str = 'M', email: str | None = None) -> list[str]:
+    return [email or f'voter{number}@example.com', gender, f'Voter {number}', department, f'MAT{number:05d}']
+
+
+def create_voter(admin: Admin, number: int, **fields) -> Voter:
+    return Voter.objects.create(
+        added_by=admin, **dict(zip(REQUIRED_COLUMNS, voter_row(number, **fields), strict=True))
+    )
+
+
+def make_csv(rows: list[list[str]]) -> bytes:
+    return '\n'.join([','.join(REQUIRED_COLUMNS), *(','.join(row) for row in rows), '']).encode()
+
+
+def make_xlsx(rows: list[list[str | None]]) -> bytes:
+    workbook = Workbook()
+    workbook.active.append(REQUIRED_COLUMNS)
+    for row in rows:
+        workbook.active.append(row)
+    content = io.BytesIO()
+    workbook.save(content)
+    return content.getvalue()
+
+
+def upload_voters(admin: Admin, rows: list[list[str]], file_type: str = 'csv') -> VoterUpload:
+    """Upload a file of ``rows`` and return the upload once every task it enqueued has run."""
+    content = make_xlsx(rows) if file_type == 'xlsx' else make_csv(rows)
+    upload = VoterUpload.objects.create(user=admin, file=SimpleUploadedFile(f'voters.{file_type}', content))
+    dispatch_pending_uploads(upload_ids=[upload.id])
+    upload.refresh_from_db()
+    return upload
+
+
+@pytest.fixture(autouse=True)
+def immediate_huey(settings, tmp_path):
+    """Run tasks as soon as they are enqueued, with files, the cache and emails kept local."""
+    settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+    settings.STORAGES = {**settings.STORAGES, 'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'}}
+    settings.MEDIA_ROOT = tmp_path
+    settings.EMAIL = {**settings.EMAIL, 'BACKEND': 'api.emails.MemoryBackend'}
+    settings.VOTER_UPLOAD = {
+        **settings.VOTER_UPLOAD,
+        'CHUNK_SIZE': CHUNK_SIZE,
+        'PARSER_POOL_SIZE': 0,
+        'PROGRESS_FLUSH_INTERVAL': 0,
+    }
+    get_email_backend.cache_clear()
+    auth_cache.clear()
+    MemoryBackend.outbox.clear()
+    HUEY.immediate = True
+    yield
+    HUEY.immediate = False
+    get_email_backend.cache_clear()
+
+
+@pytest.fixture
+def admin():
+    return Admin.objects.create(email='admin@example.com')
+
+
+@pytest.fixture
+def api_client(admin):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {generate_access_token(admin)}')
+    return client
+
+
+@pytest.fixture
+def sharded(monkeypatch):
+    """Split every CSV upload into three shards, which SQLite never does on its own."""
+    monkeypatch.setattr(tasks, 'get_shard_count', lambda _file_size: 3)
+
+
+@pytest.mark.usefixtures('sharded')
+def test_upload_fans_out_to_shards(admin):
+    upload = upload_voters(admin, [voter_row(number) for number in range(30)])
+
+    shards = list(upload.shards.order_by('start'))
+    assert upload.status == 'completed'
+    assert upload.shard_count == upload.completed_shards == len(shards) == 3
+    assert [shard.end for shard in shards[:-1]] == [shard.start for shard in shards[1:]]
+    assert shards[-1].end == upload.file.size
+    assert all(shard.completed and shard.offset == shard.end for shard in shards)
+    assert [shard.inserted_records for shard in shards] == [10, 10, 10]
+    assert Voter.objects.filter(added_by=admin).count() == 30
+
+
+@pytest.mark.usefixtures('sharded')
+def test_quoted_line_breaks_stay_in_one_record(admin):
+    rows = [voter_row(number) for number in range(12)]
+    for row in rows[3::2]:
+        row[2] = f'"{row[2]}\nthe second"'
+
+    upload = upload_voters(admin, rows)
+
+    assert upload.processed_records == 12
+    assert upload.invalid_records == 0
+    assert Voter.objects.filter(full_name__endswith='\nthe second').count() == 5
+
+
+def test_stray_quote_extends_a_csv_block_by_a_bounded_number_of_lines(admin):
+    rows = [voter_row(number) for number in range(300)]
+    rows[10][2] = 'Ada "The Countess'  # one quote in an unquoted value, which parsers keep as text
+
+    blocks = [block for block, _ in iter_csv_blocks(io.BytesIO(make_csv(rows)), CHUNK_SIZE)]
+
+    assert max(block.count(b'\n') - 1 for block in blocks) <= CHUNK_SIZE + CSV_MAX_QUOTED_LINES
+    assert sum(len(parse_csv_block(block, admin.id)[0]) for block in blocks) == 300
+
+
+@pytest.mark.usefixtures('sharded')
+def test_stray_quote_doesnt_hold_the_rest_of_an_upload_together(admin):
+    rows = [voter_row(number) for number in range(300)]
+    rows[10][2] = 'Ada "The Countess'
+
+    upload = upload_voters(admin, rows)
+
+    assert upload.processed_records == 300
+    assert upload.shards.count() == 3
+    assert Voter.objects.get(matriculation_number='MAT00010').full_name == 'Ada "The Countess'
+
+
+@pytest.mark.usefixtures('sharded')
+def test_pipelined_upload_saves_chunks_in_file_order(admin, settings, monkeypatch):
+    settings.VOTER_UPLOAD = {**settings.VOTER_UPLOAD, 'PARSER_POOL_SIZE': 2, 'PARSER_QUEUE_DEPTH': 2}
+    checkpoints = []
+
+    def record_checkpoint(checkpoint, shard, voters, rejected, offset, **kwargs):
+        checkpoints.append((shard.id, offset, len(voters) + len(rejected)))
+        save_upload_chunk(checkpoint, shard, voters, rejected, offset, **kwargs)
+
+    monkeypatch.setattr(tasks, 'save_upload_chunk', record_checkpoint)
+    rows = [voter_row(number) for number in range(60)]
+    rows[25][0] = 'not-an-email'
+
+    upload = upload_voters(admin, rows)
+
+    assert get_parser_pool()._processes  # noqa: SLF001 (the chunks were parsed in other processes)
+    assert (upload.status, upload.processed_records, upload.invalid_records) == ('completed', 59, 1)
+    assert sum(rows for _, _, rows in checkpoints) == 60
+    for shard in upload.shards.all():
+        offsets = [offset for shard_id, offset, _ in checkpoints if shard_id == shard.id]
+        assert offsets == sorted(set(offsets))
+        assert offsets[-1] == shard.offset == shard.end
+
+
+@pytest.mark.usefixtures('sharded')
+def test_upload_counts_add_up_across_shards(admin):
+    rows = [
+        *(voter_row(number, department='Physics', gender='MF'[number % 2]) for number in range(10)),
+        voter_row(10, email='not-an-email'),
+        *(voter_row(number, department='Chemistry', gender='F') for number in range(11, 20)),
+        voter_row(20, gender='XY'),
+        [*voter_row(21)[:2], '', *voter_row(21)[3:]],
+    ]
+
+    upload = upload_voters(admin, rows)
+
+    assert (upload.total_records, upload.processed_records, upload.invalid_records) == (22, 19, 3)
+    assert upload.duplicate_records == 0
+    assert upload.shards.filter(completed=True).count() == 3
+
+    counts = VoterCount.objects.filter(added_by=admin).values_list('department', 'gender', 'count')
+    assert sorted(counts) == [('Chemistry', 'F', 9), ('Physics', 'F', 5), ('Physics', 'M', 5)]
+
+    with upload.rejected_file.open('rb') as rejected:
+        lines = rejected.read().decode().splitlines()
+    assert lines[0] == ','.join([*REQUIRED_COLUMNS, 'reason'])
+    assert [line.split(',')[0] for line in lines[1:]] == ['not-an-email', 'voter20@example.com', 'voter21@example.com']
+
+
+def test_rejected_xlsx_rows_are_kept_in_the_rejected_file(admin):
+    rows = [voter_row(number) for number in range(10)]
+    rows[1] = voter_row(1, email='voter1@example')
+    rows[4] = voter_row(4, gender='MF')
+    rows[6][2] = 'V' * 201
+    rows[9][3] = None
+
+    upload = upload_voters(admin, rows, file_type='xlsx')
+
+    assert (upload.total_records, upload.processed_records, upload.invalid_records) == (10, 6, 4)
+    assert Voter.objects.filter(added_by=admin).count() == 6
+    with upload.rejected_file.open('rb') as rejected:
+        report = pd.read_csv(rejected, dtype=str, keep_default_na=False)
+    assert list(report.columns) == [*REQUIRED_COLUMNS, 'reason']
+    assert report['matriculation_number'].tolist() == ['MAT00001', 'MAT00004', 'MAT00006', 'MAT00009']
+    assert report['reason'].tolist() == [
+        'invalid email',
+        'gender must be a single character',
+        'full_name longer than 200 characters',
+        'missing department',
+    ]
+    assert report.loc[2, 'full_name'] == 'V' * 201
+
+
+@pytest.mark.usefixtures('sharded')
+def test_upload_is_finalized_once(admin, monkeypatch):
+    finalized = []
+    finalize_upload = tasks.finalize_upload
+    monkeypatch.setattr(
+        tasks, 'finalize_upload', lambda upload_id: finalized.append(upload_id) or finalize_upload(upload_id)
+    )
+
+    upload = upload_voters(admin, [voter_row(number) for number in range(30)])
+    for shard in upload.shards.all():
+        process_upload_shard(shard.id, shard.lease)  # a duplicate delivery of a finished shard
+
+    assert finalized == [upload.id]
+    assert [email['to'] for email in MemoryBackend.outbox] == [admin.email]
+
+
+def test_stale_shard_resumes_from_its_checkpoint(admin, monkeypatch):
+    monkeypatch.setattr(tasks, 'get_shard_count', lambda _file_size: 1)
+    with monkeypatch.context() as patch:
+        patch.setattr(tasks, 'process_upload_shard', lambda *_args, **_kwargs: None)
+        upload = upload_voters(admin, [voter_row(number) for number in range(10)])
+    shard = upload.shards.get()
+
+    def save_then_die(*args, **kwargs):
+        if shard.offset != UploadShard.objects.values_list('offset', flat=True).get(id=shard.id):
+            raise WorkerDiedError
+        save_upload_chunk(*args, **kwargs)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(tasks, 'save_upload_chunk', save_then_die)
+        with pytest.raises(WorkerDiedError):
+            process_upload_shard.call_local(shard.id, shard.lease)
+
+    interrupted = UploadShard.objects.get(id=shard.id)
+    assert interrupted.inserted_records == CHUNK_SIZE
+    assert Voter.objects.count() == CHUNK_SIZE
+
+    UploadShard.objects.filter(id=shard.id).update(heartbeat_at=timezone.now() - timedelta(hours=1))
+    reap_stale_uploads()
+    process_upload_shard(shard.id, shard.lease)  # the old task came back, after its shard was taken over
+
+    resumed = UploadShard.objects.get(id=shard.id)
+    upload.refresh_from_db()
+    assert resumed.lease != shard.lease
+    assert resumed.completed
+    assert (upload.status, upload.processed_records, upload.duplicate_records) == ('completed', 10, 0)
+    assert Voter.objects.count() == 10
+
+
+def test_stale_unplanned_upload_returns_to_pending(admin):
+    now, stale = timezone.now(), timezone.now() - timedelta(hours=2)
+    claimed = {'user': admin, 'status': 'processing'}
+    queued = VoterUpload.objects.create(file='voters/queued.csv', claimed_at=now, **claimed)
+    lost = VoterUpload.objects.create(file='voters/lost.csv', claimed_at=stale, **claimed)
+    died = VoterUpload.objects.create(file='voters/died.csv', claimed_at=stale, heartbeat_at=stale, **claimed)
+
+    reap_stale_uploads()
+
+    assert VoterUpload.objects.get(id=queued.id).status == 'processing'
+    assert VoterUpload.objects.get(id=lost.id).status == 'pending'
+    assert VoterUpload.objects.get(id=died.id).status == 'pending'
+
+
+@pytest.mark.usefixtures('sharded')
+@pytest.mark.parametrize('lookup_cost', [0, 1_000_000], ids=['lookups', 'seeded'])
+def test_duplicates_are_dropped_and_counted(admin, settings, lookup_cost):
+    settings.VOTER_UPLOAD = {**settings.VOTER_UPLOAD, 'DEDUPE_LOOKUP_COST': lookup_cost}
+    for number in range(5):
+        create_voter(admin, number)
+
+    rows = [
+        *(voter_row(number) for number in range(100, 110)),
+        *(voter_row(number) for number in range(2)),  # already in the database
+        *(voter_row(number) for number in range(100, 103)),  # earlier in the file, in another shard
+        voter_row(200, email='voter103@example.com'),  # same email, new matriculation number
+    ]
+    upload = upload_voters(admin, rows)
+
+    assert (upload.processed_records, upload.duplicate_records, upload.dropped_records) == (10, 6, 6)
+    assert Voter.objects.count() == 15
+    assert sum(VoterCount.objects.values_list('count', flat=True)) == 15
+
+
+@pytest.mark.parametrize('seed', [7, 8, 9])
+def test_fair_share_cuts_the_wait_of_small_uploads(seed):
+    args = make_parser().parse_args(['--seed', str(seed)])
+    jobs = make_jobs(args)
+
+    def p95_wait(finished: list[Job], *, bulk: bool) -> float:
+        waits = sorted(job.finished - job.arrival for job in finished if (job.admin == 'bulk-admin') == bulk)
+        return percentile(waits, 95)
+
+    first_come = simulate(jobs, args, fair_share=False)
+    fair_share = simulate(jobs, args, fair_share=True)
+
+    assert all(job.finished for job in fair_share)
+    assert p95_wait(fair_share, bulk=False) < p95_wait(first_come, bulk=False) / 2
+    # large uploads pay for it, but only by a fraction of their wait
+    assert p95_wait(fair_share, bulk=True) < p95_wait(first_come, bulk=True) * 1.5
+
+
+def test_failed_planning_changes_the_uploads_version(admin):
+    upload = VoterUpload.objects.create(user=admin, file=SimpleUploadedFile('voters.txt', make_csv([voter_row(1)])))
+    claim_pending_uploads(1, upload_ids=[upload.id])
+    version = get_list_version(UPLOADS, admin.id)
+
+    process_upload(upload.id)
+
+    upload.refresh_from_db()
+    assert upload.status == 'failed'
+    assert upload.reason == 'Unsupported file type: txt'
+    assert get_list_version(UPLOADS, admin.id) != version
+
+
+def test_upload_is_left_pending_when_it_cant_be_enqueued(admin, api_client, monkeypatch):
+    def queue_down(*_args, **_kwargs):
+        msg = 'Connection refused'
+        raise redis.ConnectionError(msg)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(tasks, 'process_upload', queue_down)
+        file = SimpleUploadedFile('voters.csv', make_csv([voter_row(1)]))
+        response = api_client.post(reverse('upload-voters'), {'file': file})
+
+    upload = VoterUpload.objects.get(user=admin)
+    assert response.status_code == 200
+    assert upload.status == 'pending'
+
+    assert dispatch_pending_uploads() == [upload.id]
+    upload.refresh_from_db()
+    assert (upload.status, upload.processed_records) == ('completed', 1)
+
+
+def test_cached_admin_is_dropped_when_it_changes(admin):
+    token = generate_access_token(admin)
+    auth_cache.reset_stats()
+
+    assert JWTAuthentication().authenticate_token(token).email == 'admin@example.com'
+    assert JWTAuthentication().authenticate_token(token).email == 'admin@example.com'
+    admin.email = 'changed@example.com'
+    admin.save()
+    assert JWTAuthentication().authenticate_token(token).email == 'changed@example.com'
+    admin.delete()
+    with pytest.raises(AuthenticationFailed, match='User not found'):
+        JWTAuthentication().authenticate_token(token)
+
+    stats = auth_cache.stats()
+    assert (stats['local_hits'], stats['shared_hits'], stats['misses']) == (1, 0, 3)
+
+
+def test_cached_token_is_dropped_when_it_expires_or_changes(admin, settings, monkeypatch):
+    settings.JWT_AUTH = {**settings.JWT_AUTH, 'JWT_EXPIRATION_DELTA': timedelta(seconds=10)}
+    token = generate_access_token(admin)
+    JWTAuthentication().authenticate_token(token)
+
+    header, payload, signature = token.split('.')
+    with pytest.raises(AuthenticationFailed, match='Invalid token'):
+        JWTAuthentication().authenticate_token(f'{header}.{payload}.{signature[::-1]}')
+
+    # the token expires before LOCAL_TTL runs out, so its exp is what evicts it
+    now = time.time()
+    clock = type('Clock', (), {'time': staticmethod(lambda: now + 5)})
+    monkeypatch.setattr(authentication, 'time', clock)
+    assert auth_cache.get(token) == admin
+    clock.time = staticmethod(lambda: now + 11)
+    assert auth_cache.get(token) is None
+    assert auth_cache.stats()['size'] == 0
+
+
+def voter_list_queryset(admin: Admin, query: str = ''):
+    """The queryset ``VotersAPIView`` lists for ``admin`` with the given query string."""
+    view = VotersAPIView()
+    view.request = Request(RequestFactory().get(f'/?{query}'))
+    view.request.user = admin
+    return view.filter_queryset(view.get_queryset())
+
+
+@pytest.mark.parametrize(
+    ('query', 'index'),
+    [
+        ('', 'voter_added_by_created_idx'),
+        ('department=Law', 'voter_added_by_department_idx'),
+        ('ordering=full_name', 'voter_added_by_full_name_idx'),
+    ],
+)
+def test_voter_pages_are_read_from_their_index(query, index):
+    admins = [Admin.objects.create(email=f'admin{number}@example.com') for number in range(4)]
+    for number, admin in enumerate(admins):
+        rows = [voter_row(number * 1000 + row, department=['Law', 'Physics'][row % 2]) for row in range(1000)]
+        voters, _ = prepare_voters(pd.DataFrame(rows, columns=REQUIRED_COLUMNS), added_by_id=admin.id)
+        with transaction.atomic():
+            get_voter_loader()(voters)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE api_voter')
+
+    voters = voter_list_queryset(admins[0], query)
+    ordering = list(voters.query.order_by)
+    last = voters[200]
+    deep_page = voters.filter(
+        KeysetPagination.after(ordering, [getattr(last, field.lstrip('-')) for field in ordering])
+    )
+
+    plan = voters[: KeysetPagination.default_limit + 1].explain()
+    assert index in plan, plan
+    # the first page is read in index order, without sorting the admin's voters
+    assert 'TEMP B-TREE' not in plan, plan
+    assert 'Sort' not in plan, plan
+
+    plan = deep_page[: KeysetPagination.default_limit + 1].explain()
+    assert index in plan, plan
+
+
+def fetch_voter_pages(api_client, params: dict, between_pages=None) -> list[str]:
+    """Follow the voters list cursors to the end and return the matriculation numbers in page order."""
+    numbers, cursor = [], None
+    for page in range(1, 50):
+        response = api_client.get(reverse('voters'), {**params, **({'cursor': cursor} if cursor else {})})
+        assert response.status_code == 200
+        numbers += [voter['matriculation_number'] for voter in response.json()['data']]
+        cursor = response.json()['next']
+        if cursor is None:
+            return numbers
+        if between_pages:
+            between_pages(page)
+    pytest.fail('The cursor never reached the end of the list')
+
+
+def test_voters_pages_are_stable_under_inserts(admin, api_client):
+    for number in range(10):
+        create_voter(admin, number)
+    # ties on created_at are broken by id, so no voter is skipped or repeated at a page boundary
+    Voter.objects.filter(matriculation_number__in=['MAT00003', 'MAT00004', 'MAT00005']).update(
+        created_at=timezone.now() - timedelta(hours=1)
+    )
+    expected = list(
+        Voter.objects.filter(added_by=admin)
+        .order_by('-created_at', '-id')
+        .values_list('matriculation_number', flat=True)
+    )
+
+    inserted = iter(range(100, 110))
+    numbers = fetch_voter_pages(api_client, {'limit': 3}, lambda _page: create_voter(admin, next(inserted)))
+
+    assert numbers == expected
+    assert Voter.objects.filter(added_by=admin).count() == 13
+
+
+def test_filtered_voter_pages_are_stable_under_inserts(admin, api_client):
+    for number in range(12):
+        create_voter(admin, number, department='Physics' if number % 3 else 'Chemistry')
+    Voter.objects.filter(matriculation_number__in=['MAT00001', 'MAT00002', 'MAT00004']).update(full_name='Ada Voter')
+    params = {'limit': 2, 'department': 'Physics', 'search': 'voter', 'ordering': 'full_name'}
+
+    def insert_around_cursor(page: int):
+        if page == 2:
+            # sorts before the rows already sent, so it is not part of the rest of the list
+            create_voter(admin, 200, department='Physics')
+            Voter.objects.filter(matriculation_number='MAT00200').update(full_name='Aaron Voter')
+            # sorts after the cursor and is picked up by a later page
+            create_voter(admin, 201, department='Physics')
+            Voter.objects.filter(matriculation_number='MAT00201').update(full_name='Zed Voter')
+            create_voter(admin, 202, department='Chemistry')
+
+    numbers = fetch_voter_pages(api_client, params, insert_around_cursor)
+
+    physics = Voter.objects.filter(added_by=admin, department='Physics').exclude(matriculation_number='MAT00200')
+    assert numbers == list(physics.order_by('full_name', 'id').values_list('matriculation_number', flat=True))
+    assert sorted(numbers[:3]) == ['MAT00001', 'MAT00002', 'MAT00004']
+    assert numbers[-1] == 'MAT00201'
+
+
+def read_export(response, export_format: str) -> pd.DataFrame:
+    content = b''.join(response.streaming_content)
+    if response.get('Content-Encoding') == 'gzip':
+        content = gzip.decompress(content)
+    if export_format == 'csv':
+        frame = pd.read_csv(io.BytesIO(content), dtype=str, keep_default_na=False)
+    elif export_format == 'parquet':
+        frame = pd.read_parquet(io.BytesIO(content))
+    else:
+        frame = pd.read_excel(
+            io.BytesIO(content), dtype={column: str for column in EXPORT_COLUMNS if column != 'created_at'}
+        )
+    frame['created_at'] = pd.to_datetime(frame['created_at'], utc=True)
+    return frame
+
+
+@pytest.mark.parametrize(
+    ('export_format', 'accept_encoding'), [('csv', ''), ('csv', 'gzip'), ('parquet', ''), ('xlsx', '')]
+)
+def test_voters_export_round_trips(admin, api_client, monkeypatch, export_format, accept_encoding):
+    monkeypatch.setattr(views, 'iter_voter_frames', partial(iter_voter_frames, chunk_size=3))
+    for number in range(7):
+        create_voter(admin, number)
+    create_voter(admin, 7, email='"quoted",voter@example.com')
+    Voter.objects.filter(matriculation_number='MAT00003').update(full_name='Zoë, "Z" Ndiaye\nJr.')
+
+    response = api_client.get(
+        reverse('export-voters'), {'format': export_format}, HTTP_ACCEPT_ENCODING=accept_encoding
+    )
+
+    assert response.status_code == 200
+    assert response['Content-Disposition'] == f'attachment; filename="voters.{export_format}"'
+    assert (response.get('Content-Encoding') == 'gzip') == (accept_encoding == 'gzip')
+    expected = pd.DataFrame.from_records(
+        Voter.objects.filter(added_by=admin).order_by('-created_at', '-id').values_list(*EXPORT_COLUMNS),
+        columns=EXPORT_COLUMNS,
+    )
+    exported = read_export(response, export_format)
+    if export_format == 'xlsx':
+        # Excel stores times as fractions of a day, which are only precise to the millisecond
+        expected['created_at'] = expected['created_at'].dt.round('ms')
+        exported['created_at'] = exported['created_at'].dt.round('ms')
+    pd.testing.assert_frame_equal(exported, expected, check_dtype=False)
+
+
+def test_voters_list_is_revalidated_by_its_etag(admin, api_client):
+    url = reverse('voters')
+    first = api_client.get(url)
+    assert first.status_code == 200
+    assert not first.has_header('Last-Modified')
+    assert api_client.get(url, HTTP_IF_NONE_MATCH=first['ETag']).status_code == 304
+
+    create_voter(admin, 1)
+
+    second = api_client.get(url, HTTP_IF_NONE_MATCH=first['ETag'])
+    assert second.status_code == 200
+    assert second['ETag'] != first['ETag']
+    assert 'voter1@example.com' in second.content.decode()
+    assert api_client.get(url, HTTP_IF_MODIFIED_SINCE=http_date()).status_code == 200
+
+
+@pytest.fixture(params=['locmem', 'database'])
+def otp_cache(request, settings):
+    """The caches OTPs are kept in when Redis isn't used; the database cache is shared by processes."""
+    if request.param == 'database':
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache', 'LOCATION': 'cache'}}
+        call_command('createcachetable')
+
+
+@pytest.mark.usefixtures('otp_cache')
+def test_otp_can_only_be_used_once():
+    otp = issue_otp('admin@example.com')
+
+    assert verify_otp('admin@example.com', otp)
+    assert not verify_otp('admin@example.com', otp)
+
+
+@pytest.mark.usefixtures('otp_cache')
+def test_otp_is_dropped_after_too_many_wrong_guesses(settings):
+    otp = issue_otp('admin@example.com')
+    wrong = str((int(otp) + 1) % 10 ** len(otp)).zfill(len(otp))
+
+    assert not any(verify_otp('admin@example.com', wrong) for _ in range(settings.OTP['MAX_ATTEMPTS']))
+    assert not verify_otp('admin@example.com', otp)
+    assert verify_otp('admin@example.com', issue_otp('admin@example.com'))  # a new code starts over
+
+
+@pytest.mark.usefixtures('otp_cache')
+def test_otp_read_by_two_workers_is_accepted_once():
+    otp = issue_otp('admin@example.com')
+    entry = cache.get(f'{OTP_KEY_PREFIX}admin@example.com')
+
+    assert verify_otp('admin@example.com', otp)
+    cache.set(f'{OTP_KEY_PREFIX}admin@example.com', entry)  # what another worker read before the code was used
+    assert not verify_otp('admin@example.com', otp)
+
+
+def test_otp_is_accepted_once_by_concurrent_checks():
+    otp = issue_otp('admin@example.com')
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        accepted = list(executor.map(lambda _: verify_otp('admin@example.com', otp), range(8)))
+
+    assert accepted.count(True) == 1
+
+
+def test_progress_stream_ends_when_the_upload_is_deleted(admin, settings):
+    settings.VOTER_UPLOAD = {**settings.VOTER_UPLOAD, 'PROGRESS_POLL_INTERVAL': 0.01}
+    upload = VoterUpload.objects.create(user=admin, file='voters/deleted.csv', status='processing')
+    publish_progress(upload.id)
+
+    async def follow() -> tuple[bytes, list[bytes]]:
+        events = iter_progress_events(upload.id, None)
+        first = await anext(events)
+        await sync_to_async(upload.delete)()
+        return first, [event async for event in events]
+
+    first, rest = async_to_sync(follow)()
+    assert first.startswith(b'id: ')
+    assert rest == []
+    assert async_to_sync(await_progress)(upload.id, None) is None
@@ -1,11 +1,31 @@
 from django.urls import path
 
-from .views import VotersAPIView, VoterUploadView, VerifyOtpAPIView, RequestOtpAPIView, VoterUploadListView
+from .views import (
+    VotersAPIView,
+    VoterStatsView,
+    VoterExportView,
+    VoterUploadView,
+    VerifyOtpAPIView,
+    RequestOtpAPIView,
+    UploadProgressView,
+    VoterUploadListView,
+    UploadProgressTokenView,
+    VoterUploadRejectedView,
+)
 
 urlpatterns = [
     path('voters', VotersAPIView.as_view(), name='voters'),
+    path('voters/stats', VoterStatsView.as_view(), name='voter-stats'),
+    path('voters/export', VoterExportView.as_view(), name='export-voters'),
     path('auth/verify-otp', VerifyOtpAPIView.as_view(), name='verify-otp'),
     path('voters/uploads', VoterUploadView.as_view(), name='upload-voters'),
     path('auth/request-otp', RequestOtpAPIView.as_view(), name='request-otp'),
     path('voters/uploads/status', VoterUploadListView.as_view(), name='voters-upload-job'),
+    path('voters/uploads/<str:upload_id>/progress', UploadProgressView.as_view(), name='upload-progress'),
+    path(
+        'voters/uploads/<str:upload_id>/progress-token',
+        UploadProgressTokenView.as_view(),
+        name='upload-progress-token',
+    ),
+    path('voters/uploads/<str:upload_id>/rejected', VoterUploadRejectedView.as_view(), name='upload-rejected'),
 ]
@@ -0,0 +1,37 @@
+import hashlib
+
+from django.db import transaction
+from django.utils import timezone
+from django.core.cache import cache
+
+VOTERS = 'voters'
+UPLOADS = 'uploads'
+
+
+def _version_key(kind: str, user_id: str) -> str:
+    return f'list-version:{kind}:{user_id}'
+
+
+def bump_list_version(kind: str, user_id: str):
+    """
+    Mark an admin's voters or uploads list as changed.
+
+    The new version is stored once the current transaction commits, so clients can't fetch
+    the old rows under the new version.
+
+    Args:
+        kind (str): ``VOTERS`` or ``UPLOADS``.
+        user_id (str): Identifier of the admin owning the list.
+    """
+    transaction.on_commit(lambda: cache.set(_version_key(kind, user_id), timezone.now().timestamp(), timeout=None))
+
+
+def get_list_version(kind: str, user_id: str) -> float:
+    """Return the timestamp of the last change to a list, starting a new version if none is known."""
+    return cache.get_or_set(_version_key(kind, user_id), lambda: timezone.now().timestamp(), timeout=None)
+
+
+def list_etag(kind: str, request) -> str:
+    """An ``ETag`` for one list response; the query string is part of it since it shapes the body."""
+    query = hashlib.md5(request.META.get('QUERY_STRING', '').encode(), usedforsecurity=False).hexdigest()[:12]
+    return f'{kind}-{get_list_version(kind, request.user.id)}-{query}'
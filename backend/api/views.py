@@ -1,20 +1,59 @@
-import secrets
-
-from django.core.cache import cache
+import logging
+from pathlib import Path
+from functools import partial
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views import View
+from django.utils.dateparse import parse_datetime
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import condition
+from django.views.decorators.cache import cache_control
 
 from rest_framework import status
 from rest_framework.views import APIView
+from rest_framework.filters import SearchFilter
 from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.generics import ListAPIView, GenericAPIView
 from rest_framework.response import Response
+from rest_framework.renderers import JSONRenderer
+from rest_framework.exceptions import ValidationError, AuthenticationFailed
 from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+from rest_framework.negotiation import BaseContentNegotiation
 from rest_framework.permissions import IsAuthenticated
 
-from .tasks import send_email
+from core.authentication import JWTAuthentication
+
+from .otp import issue_otp, verify_otp
+from .stats import get_voter_stats
+from .tasks import send_email, dispatch_pending_uploads
 from .utils import generate_access_token, generate_refresh_token
 from .models import Admin, Voter, VoterUpload
+from .exports import EXPORT_FORMATS, iter_voter_frames
+from .filters import FieldFilter, KeysetOrderingFilter
+from .progress import (
+    aget_progress,
+    await_progress,
+    public_progress,
+    read_progress_token,
+    issue_progress_token,
+    iter_progress_events,
+)
+from .versions import VOTERS, UPLOADS, list_etag
+from .ingestion import estimate_upload_rows
+from .renderers import render_json
+from .streaming import is_asgi, aiterate, streaming_content
+from .pagination import KeysetPagination
 from .serializers import VoterSerializer, VerifyOTPSerializer, RequestOTPSerializer, VoterUploadSerializer
 
+logger = logging.getLogger(__name__)
+
+STREAM_CHUNK_SIZE = 2000
+
 
 class UserOnePerMinuteThrottle(UserRateThrottle):
     rate = '1/minute'
@@ -33,28 +72,8 @@ class RequestOtpAPIView(GenericAPIView):
         serializer.is_valid(raise_exception=True)
 
         email = serializer.validated_data['email']
-        Admin.objects.get_or_create(email=email)
-
-        otp = ''.join([str(secrets.randbelow(10)) for _ in range(6)])
-        cache.set(f'otp:{email}', otp, timeout=900)  # 15 minutes
-
-        email_subject = 'Your Verification Code for Secure Access'
-        email_body = f"""
-        <html>
-        <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
-            <h2>Verification Code for Your Account</h2>
-            <p>Hello,</p>
-            <p>You've requested a verification code to access your account. Here's your 6-digit code:</p>
-            <h1 style="font-size: 32px; background-color: #f0f0f0; padding: 10px; text-align: center; letter-spacing: 5px;">{otp}</h1>
-            <p>This code will expire in 15 minutes for security reasons.</p>
-            <p><strong>Important:</strong> If you didn't request this code, please ignore this email. Your account security is important to us.</p>
-            <p>Thank you for using our service.</p>
-            <p>Best regards,<br>Your Support Team</p>
-        </body>
-        </html>
-        """  # noqa: E501
-
-        send_email(to=email, subject=email_subject, html=email_body)
+        otp = issue_otp(email)
+        send_email(to=email, template='otp', context={'otp': otp, 'expires_in': settings.OTP['TTL'] // 60})
 
         return Response(
             data={'success': True, 'message': 'Verification code sent to your email address'},
@@ -72,17 +91,11 @@ class VerifyOtpAPIView(GenericAPIView):
         email = serializer.validated_data['email']
         otp = serializer.validated_data['otp']
 
-        cached_otp = cache.get(f'otp:{email}', default=None)
-        if cached_otp is None:
+        if not verify_otp(email, otp):
             return Response(data={'success': False, 'error': 'invalid otp'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if cached_otp != otp:
-            return Response(data={'success': False, 'error': 'invalid otp'}, status=status.HTTP_400_BAD_REQUEST)
-
-        try:
-            user = Admin.objects.get(email=email)
-        except Admin.DoesNotExist:
-            return Response(data={'success': False, 'error': 'invalid otp'}, status=status.HTTP_400_BAD_REQUEST)
+        # admins are only created once they proved they own the address
+        user, _ = Admin.objects.get_or_create(email=email)
 
         access_token = generate_access_token(user)
         refresh_token = generate_refresh_token(user)
@@ -101,31 +114,178 @@ class VoterUploadView(APIView):
         if not file:
             return Response({'success': False, 'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
 
-        VoterUpload.objects.create(
+        upload = VoterUpload.objects.create(
             file=file,
             user=request.user,
+            estimated_records=self.estimate_records(file),
         )
 
+        # small uploads start right away instead of waiting for the next fetch_all_pending_uploads run
+        if upload.file.size <= settings.VOTER_UPLOAD['IMMEDIATE_MAX_SIZE']:
+            dispatch_pending_uploads(1, upload_ids=[upload.id])
+
         return Response(
             data={'success': True},
             status=status.HTTP_200_OK,
         )
 
+    @staticmethod
+    def estimate_records(file) -> int | None:
+        """Sample the received file to size its priority lane; unreadable files are left to fail in the task."""
+        try:
+            return estimate_upload_rows(file, file.name.split('.')[-1].lower())
+        except Exception:
+            logger.warning(f'Could not estimate the records of {file.name}', exc_info=True)
+            return None
+        finally:
+            file.seek(0)
+
 
+@method_decorator(cache_control(private=True, no_cache=True), name='get')
+@method_decorator(condition(etag_func=partial(list_etag, VOTERS)), name='get')
 class VotersAPIView(ListAPIView):
+    """
+    List the voters added by the authenticated admin, newest first.
+
+    Responses carry an ``ETag`` taken from the admin's voters list version, so an unchanged
+    list answers ``304`` before any row is read. There is no ``Last-Modified``: HTTP dates
+    are whole seconds and would miss a change made in the same second. Browsers must
+    revalidate every time (``no-cache``) so they never show a stale list. ``?since=`` only
+    returns voters created after the given ISO 8601 timestamp.
+
+    The list is filtered on the server so that clients only fetch the page they show:
+    ``?department=`` and ``?gender=`` keep exact matches, ``?search=`` keeps the voters whose
+    name, email or matriculation number contain every word searched, and ``?ordering=``
+    sorts by any listed column, e.g. ``?ordering=-full_name``. On PostgreSQL searches are
+    served by trigram indexes; SQLite falls back to scanning with ``LIKE``.
+    """
+
     serializer_class = VoterSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    filter_backends = [FieldFilter, SearchFilter, KeysetOrderingFilter]
+    filter_fields = ['department', 'gender']
+    search_fields = ['full_name', 'email', 'matriculation_number']
+    ordering_fields = ['created_at', 'full_name', 'email', 'department', 'gender', 'matriculation_number']
+    ordering = KeysetPagination.ordering
     queryset = Voter.objects.get_queryset()
 
     def get_queryset(self):
         qs = super().get_queryset()
-        return qs.filter(added_by__email=self.request.user.email)
+        qs = qs.filter(added_by_id=self.request.user.id).order_by(*KeysetPagination.ordering)
+
+        since = self.request.query_params.get('since')
+        if since:
+            try:
+                since = parse_datetime(since)
+            except ValueError:
+                since = None
+            if since is None:
+                msg = {'since': 'Enter a valid ISO 8601 timestamp'}
+                raise ValidationError(msg)
+            if timezone.is_naive(since):
+                since = timezone.make_aware(since)
+            qs = qs.filter(created_at__gt=since)
+        return qs
 
     def list(self, request, *args, **kwargs):
-        response = super().list(request, *args, **kwargs)
-        return Response({'success': True, 'data': response.data}, status=response.status_code)
+        queryset = self.filter_queryset(self.get_queryset())
+
+        # ?stream=true writes the full list as it is read from the database instead of building it in memory
+        if request.query_params.get('stream') in ['1', 'true']:
+            voters = queryset.values(*VoterSerializer.Meta.fields)
+            return StreamingHttpResponse(
+                streaming_content(request, self.stream(voters)), content_type='application/json'
+            )
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        if request.accepted_renderer.format != 'json':
+            serializer = self.get_serializer(queryset, many=True)
+            return Response({'success': True, 'data': serializer.data}, status=status.HTTP_200_OK)
+
+        # plain rows encoded with orjson render the same bytes as the serializer, without building model instances
+        voters = list(queryset.values(*VoterSerializer.Meta.fields))
+        return HttpResponse(render_json({'success': True, 'data': voters}), content_type='application/json')
+
+    def stream(self, voters):
+        yield b'{"success":true,"data":['
+
+        voters = voters.iterator(chunk_size=STREAM_CHUNK_SIZE)
+        separator = b''
+        while chunk := list(islice(voters, STREAM_CHUNK_SIZE)):
+            yield separator + render_json(chunk)[1:-1]
+            separator = b','
+
+        yield b']}'
+
+
+class VoterStatsView(APIView):
+    """
+    Counts of the authenticated admin's voters per department and gender, and upload totals.
+
+    Counts come from the ``VoterCount`` summary table, so the response costs the same
+    whether the admin has a hundred voters or a million.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        return Response({'success': True, 'data': get_voter_stats(request.user.id)}, status=status.HTTP_200_OK)
+
+
+class FirstRendererNegotiation(BaseContentNegotiation):
+    """Always respond with the first renderer, leaving ``?format=`` to the view."""
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+    def select_parser(self, request, parsers):
+        return parsers[0]
+
+
+class VoterExportView(VotersAPIView):
+    """
+    Download every voter of the authenticated admin as ``?format=csv`` (default), ``parquet`` or ``xlsx``.
 
+    The same filters, search and ordering as the voters list apply. CSV and Parquet are read
+    from the database and encoded chunk by chunk while the response is sent, so memory
+    stays flat however many voters there are; CSV is gzipped on the fly for clients that
+    accept it. An Excel workbook can only be assembled once every row is known: it is built
+    in temporary files before its first byte is sent, so memory stays flat but the download
+    only starts once the whole export is done. Errors are still returned as JSON.
+    """
 
+    content_negotiation_class = FirstRendererNegotiation
+    renderer_classes = [JSONRenderer]
+    pagination_class = None
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.query_params.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            msg = {'format': f'Choose one of {", ".join(EXPORT_FORMATS)}'}
+            raise ValidationError(msg)
+
+        writer, content_type = EXPORT_FORMATS[export_format]
+        frames = iter_voter_frames(self.filter_queryset(self.get_queryset()))
+        compress = export_format == 'csv' and 'gzip' in request.headers.get('Accept-Encoding', '')
+        content = writer(frames, compress=compress) if export_format == 'csv' else writer(frames)
+        response = StreamingHttpResponse(streaming_content(request, content), content_type=content_type)
+        if export_format == 'csv':
+            response['Vary'] = 'Accept-Encoding'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+
+        response['Content-Disposition'] = f'attachment; filename="voters.{export_format}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+@method_decorator(cache_control(private=True, no_cache=True), name='get')
+@method_decorator(condition(etag_func=partial(list_etag, UPLOADS)), name='get')
 class VoterUploadListView(ListAPIView):
     permission_classes = [IsAuthenticated]
     serializer_class = VoterUploadSerializer
@@ -133,10 +293,132 @@ class VoterUploadListView(ListAPIView):
 
     def get_queryset(self):
         qs = super().get_queryset()
-        return qs.filter(user__email=self.request.user.email).order_by('-created_at')
+        return qs.filter(user_id=self.request.user.id).order_by('-created_at')
 
     def list(self, request, *args, **kwargs):
         # typically the data should be paginated but since tanstack can handle ~100k entries
         # we'll send all the voters info to the client.
         response = super().list(request, *args, **kwargs)
         return Response({'success': True, 'data': response.data}, status=response.status_code)
+
+
+class VoterUploadRejectedView(APIView):
+    """Download the rows of an upload that failed validation as CSV, with the reason of each."""
+
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id):
+        upload = (
+            VoterUpload.objects.filter(id=upload_id, user_id=request.user.id).only('file', 'rejected_file').first()
+        )
+        if upload is None or not upload.rejected_file:
+            return Response({'success': False, 'error': 'Not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        file = upload.rejected_file.open('rb')
+        response = FileResponse(
+            file, as_attachment=True, filename=f'{Path(upload.file.name).stem}-rejected.csv', content_type='text/csv'
+        )
+        if is_asgi(request):
+            # FileResponse reads the file synchronously, which ASGI would do in one go before sending it
+            response.streaming_content = aiterate(iter(partial(file.read, response.block_size), b''))
+        return response
+
+
+class UploadProgressTokenView(APIView):
+    """
+    Issue the token ``EventSource`` connects to an upload's progress stream with.
+
+    The token is only valid for that upload and for ``PROGRESS_TOKEN_TTL`` seconds, so the
+    access token never ends up in a query string.
+    """
+
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        if not VoterUpload.objects.filter(id=upload_id, user_id=request.user.id).exists():
+            return Response({'success': False, 'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        return Response(
+            data={
+                'success': True,
+                'data': {
+                    'token': issue_progress_token(upload_id, request.user.id),
+                    'expires_in': settings.VOTER_UPLOAD['PROGRESS_TOKEN_TTL'],
+                },
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class UploadProgressView(View):
+    """
+    Push the progress of one upload to its owner instead of having the uploads list polled.
+
+    With ``Accept: text/event-stream`` the response is a server-sent events stream with a
+    ``progress`` event per change, ending when the upload completes or fails. ``EventSource``
+    can't set headers, so it authenticates with ``?token=`` from ``UploadProgressTokenView``
+    and may pass ``?after=`` when it can't send ``Last-Event-ID``. Any other request long-polls
+    with the access token in the ``Authorization`` header: the latest progress is returned
+    once its ``event_id`` differs from ``?after=``.
+
+    The view is async so that waiting clients don't hold a worker; serve ``core.asgi``.
+    """
+
+    async def get(self, request, upload_id):
+        try:
+            user_id = await sync_to_async(self.authenticate)(request, upload_id)
+        except AuthenticationFailed as e:
+            return self.error_response(e.detail, status.HTTP_401_UNAUTHORIZED)
+
+        progress = await aget_progress(upload_id)
+        if progress is None or progress['user_id'] != user_id:
+            return self.error_response('Upload not found', status.HTTP_404_NOT_FOUND)
+
+        after = self.parse_event_id(request.GET.get('after'))
+        if 'text/event-stream' in request.headers.get('Accept', ''):
+            last_event_id = self.parse_event_id(request.headers.get('Last-Event-ID'))
+            response = StreamingHttpResponse(
+                iter_progress_events(upload_id, after if last_event_id is None else last_event_id),
+                content_type='text/event-stream',
+            )
+            response['Cache-Control'] = 'no-cache'
+            response['X-Accel-Buffering'] = 'no'  # don't let a reverse proxy buffer the events
+            return response
+
+        if after is not None:
+            progress = await await_progress(upload_id, after)
+            if progress is None:
+                return self.error_response('Upload not found', status.HTTP_404_NOT_FOUND)
+        return HttpResponse(
+            render_json({'success': True, 'data': public_progress(progress)}), content_type='application/json'
+        )
+
+    @staticmethod
+    def authenticate(request, upload_id: str) -> str:
+        """Return the id of the admin behind a progress token or an ``Authorization`` header."""
+        token = request.GET.get('token')
+        if token:
+            user_id = read_progress_token(token, upload_id)
+            if user_id is None:
+                msg = 'Invalid or expired progress token'
+                raise AuthenticationFailed(msg)
+            return user_id
+
+        result = JWTAuthentication().authenticate(request)
+        if result is None:
+            msg = 'Authentication credentials were not provided.'
+            raise AuthenticationFailed(msg)
+        return result[0].id
+
+    @staticmethod
+    def parse_event_id(value: str | None) -> int | None:
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def error_response(error: str, status_code: int) -> HttpResponse:
+        return HttpResponse(
+            render_json({'success': False, 'error': error}), status=status_code, content_type='application/json'
+        )
@@ -0,0 +1,71 @@
+import os
+import sys
+import time
+import resource
+from pathlib import Path
+from contextlib import contextmanager
+
+import django
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django():
+    """Configure Django the same way ``manage.py`` does."""
+    sys.path.insert(0, str(BACKEND_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'core.settings')
+    django.setup()
+
+
+@contextmanager
+def test_database():
+    """Run the benchmark against a throwaway test database instead of the configured one."""
+    from django.db import connection
+
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=0)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+
+
+def make_roster(rows: int, directory: Path, file_type: str = 'csv') -> Path:
+    """
+    Write a roster of fake voters with ``generate_fake_voters`` and return its path.
+
+    Generated files are cached in ``directory`` because Faker is much slower than anything
+    being measured.
+    """
+    from generate_fake_voters import save_to_csv, save_to_excel, generate_random_voters
+
+    filename = directory / f'voters_{rows}.{file_type}'
+    if not filename.exists():
+        directory.mkdir(parents=True, exist_ok=True)
+        voters = generate_random_voters(rows)
+        if file_type == 'csv':
+            save_to_csv(voters, str(filename))
+        else:
+            save_to_excel(voters, str(filename))
+    return filename
+
+
+def make_admin(email: str = 'bench@example.com'):
+    from api.models import Admin
+
+    admin, _ = Admin.objects.get_or_create(email=email)
+    return admin
+
+
+def peak_rss_mb() -> float:
+    """Peak resident set size of this process in MiB."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@contextmanager
+def timed(label: str, rows: int | None = None):
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    rate = f' ({rows / elapsed:,.0f} rows/s)' if rows else ''
+    print(f'{label:<40} {elapsed:8.3f}s{rate}')
@@ -0,0 +1,91 @@
+"""
+Measure email throughput against a local fake Plunk server.
+
+The legacy sender opened a new connection with ``requests.post`` for every email, while
+``PlunkBackend`` reuses a pooled keep-alive session. The fake server answers after
+``--latency`` milliseconds, and emails are sent from ``--workers`` threads like Huey workers.
+
+Usage:
+    python -m benchmarks.email --emails 2000 --workers 5 --latency 20
+"""
+
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import timed, setup_django
+
+
+class FakePlunkHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep connections alive like the real API
+    disable_nagle_algorithm = True  # otherwise every response on a reused connection waits for a delayed ACK
+    latency = 0.0
+    connections = 0
+    lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with self.lock:
+            FakePlunkHandler.connections += 1
+
+    def do_POST(self):
+        json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        time.sleep(self.latency)
+        body = b'{"success": true}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def legacy_send(url: str, to: str, subject: str, html: str):
+    """The per-email request ``send_email`` made before the pooled backend."""
+    import requests
+
+    headers = {'Authorization': 'Bearer fake', 'Content-Type': 'application/json'}
+    response = requests.post(url, json={'subject': subject, 'body': html, 'to': to}, headers=headers, timeout=15)
+    response.raise_for_status()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--emails', type=int, default=2000)
+    parser.add_argument('--workers', type=int, default=5)
+    parser.add_argument('--latency', type=float, default=20, help='milliseconds the fake server takes per email')
+    args = parser.parse_args()
+
+    setup_django()
+
+    from api.emails import PlunkBackend
+
+    FakePlunkHandler.latency = args.latency / 1000
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakePlunkHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_url = f'http://127.0.0.1:{server.server_port}/v1'
+
+    backend = PlunkBackend(api_url=api_url, api_key='fake', timeout=(3.05, 10), pool_size=args.workers)
+    cases = [
+        ('requests.post per email', lambda to: legacy_send(f'{api_url}/send', to, 'Code', '<p>123456</p>')),
+        ('pooled PlunkBackend', lambda to: backend.send(to=to, subject='Code', html='<p>123456</p>')),
+    ]
+
+    for label, send in cases:
+        FakePlunkHandler.connections = 0
+        with timed(label, rows=args.emails), ThreadPoolExecutor(max_workers=args.workers) as pool:
+            list(pool.map(send, (f'voter{i}@example.com' for i in range(args.emails))))
+        print(f'{"":<40} {FakePlunkHandler.connections} connections opened')
+
+    backend.close()
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,59 @@
+"""
+Compare ``pd.read_excel`` with the read-only openpyxl reader used for ``.xlsx`` uploads.
+
+Each reader runs in a fresh process so that the reported peak RSS belongs to it alone.
+
+Usage:
+    python -m benchmarks.excel --rows 200000
+"""
+
+import time
+import argparse
+import multiprocessing
+from pathlib import Path
+
+from benchmarks.common import make_roster, peak_rss_mb, setup_django
+
+CHUNK_SIZE = 10_000
+
+
+def read_with_pandas(path: Path) -> int:
+    import pandas as pd
+
+    return len(pd.read_excel(path, dtype=str))
+
+
+def read_streaming(path: Path) -> int:
+    from api.ingestion import iter_xlsx_frames
+
+    with path.open('rb') as file:
+        return sum(len(frame) for frame in iter_xlsx_frames(file, CHUNK_SIZE))
+
+
+def measure(reader, path: Path) -> tuple[int, float, float]:
+    setup_django()
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    rows = reader(path)
+    return rows, time.perf_counter() - start, peak_rss_mb() - baseline
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=200_000)
+    parser.add_argument('--data-dir', type=Path, default=Path('.benchmark-data'))
+    args = parser.parse_args()
+
+    context = multiprocessing.get_context('spawn')
+    # a spawned child inherits its parent's peak RSS, so the parent itself must stay small
+    with context.Pool(processes=1) as pool:
+        path = pool.apply(make_roster, (args.rows, args.data_dir, 'xlsx'))
+
+    for label, reader in [('pd.read_excel', read_with_pandas), ('read-only openpyxl', read_streaming)]:
+        with context.Pool(processes=1) as pool:
+            rows, elapsed, rss = pool.apply(measure, (reader, path))
+        print(f'{label:<25} {rows:>9,} rows {elapsed:8.2f}s  +{rss:,.0f} MiB peak RSS')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Measure ``/api/voters/export`` for every format on a large roster.
+
+Each export is read through the test client like a download, recording the time to the
+first byte, the total time, the size of the file and the peak memory allocated by Python
+while streaming it. Memory is traced in a second run because tracing slows everything down;
+it stays flat as the roster grows because only one chunk of rows is held at a time.
+
+Usage:
+    python -m benchmarks.export --rows 1000000 --formats csv csv.gz parquet xlsx
+"""
+
+import time
+import argparse
+import tracemalloc
+
+from benchmarks.common import make_admin, setup_django, test_database
+
+CREATE_BATCH_SIZE = 100_000
+
+
+def create_voters(admin, count: int):
+    import pandas as pd
+
+    from django.db import transaction
+
+    from api.loaders import get_voter_loader
+    from api.ingestion import prepare_voters
+
+    for start in range(0, count, CREATE_BATCH_SIZE):
+        indexes = range(start, min(start + CREATE_BATCH_SIZE, count))
+        frame = pd.DataFrame(
+            {
+                'email': [f'voter{index}@example.com' for index in indexes],
+                'gender': [('F', 'M')[index % 2] for index in indexes],
+                'full_name': [f'Voter {index}' for index in indexes],
+                'department': 'Computer Science',
+                'matriculation_number': [f'{index:08d}' for index in indexes],
+            }
+        )
+        voters, _ = prepare_voters(frame, added_by_id=admin.id)
+        with transaction.atomic():
+            get_voter_loader()(voters)
+
+
+def download(client, export_format: str) -> tuple[float, float, int]:
+    """Return the seconds to the first byte and to the last one, and the size of the download."""
+    headers = {}
+    if export_format == 'csv.gz':
+        export_format, headers = 'csv', {'HTTP_ACCEPT_ENCODING': 'gzip'}
+
+    start = time.perf_counter()
+    response = client.get(f'/api/voters/export?format={export_format}', **headers)
+    if response.status_code != 200:
+        msg = f'Export failed with {response.status_code}: {response.content}'
+        raise RuntimeError(msg)
+
+    first_byte, size = None, 0
+    for content in response.streaming_content:
+        if first_byte is None:
+            first_byte = time.perf_counter() - start
+        size += len(content)
+    return first_byte, time.perf_counter() - start, size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--formats', nargs='+', default=['csv', 'csv.gz', 'parquet', 'xlsx'])
+    args = parser.parse_args()
+
+    setup_django()
+
+    from rest_framework.test import APIClient
+
+    from api.utils import generate_access_token
+
+    with test_database():
+        admin = make_admin()
+        create_voters(admin, args.rows)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {generate_access_token(admin)}')
+
+        for export_format in args.formats:
+            first_byte, elapsed, size = download(client, export_format)
+
+            tracemalloc.start()
+            download(client, export_format)
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+
+            print(
+                f'{export_format:<8} {args.rows:>10,} rows  first byte {first_byte * 1000:9.1f} ms  '
+                f'total {elapsed:7.2f}s ({args.rows / elapsed:>9,.0f} rows/s)  {size / 1_048_576:8.1f} MiB  '
+                f'{peak / 1_048_576:6.1f} MiB allocated at peak'
+            )
+
+
+if __name__ == '__main__':
+    main()
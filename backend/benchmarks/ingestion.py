@@ -0,0 +1,96 @@
+"""
+Compare the legacy ``iterrows`` ingestion loop with the columnar pipeline used by ``process_upload``.
+
+On PostgreSQL the COPY loader is measured as well.
+
+Usage:
+    python -m benchmarks.ingestion --rows 100000
+"""
+
+import argparse
+from pathlib import Path
+from functools import partial
+
+from benchmarks.common import timed, make_admin, make_roster, setup_django, test_database
+
+BATCH_SIZE = 1000
+
+
+def legacy_ingest(path: Path, admin) -> int:
+    """The row-by-row loop ``process_upload`` used before the columnar pipeline."""
+    import pandas as pd
+    import shortuuid
+
+    from django.db import transaction
+
+    from api.models import Voter
+
+    @transaction.atomic
+    def batch_create_voters(voters):
+        return len(Voter.objects.bulk_create(voters, ignore_conflicts=True))
+
+    df = pd.read_csv(path)
+    valid_records = 0
+    voters_to_create = []
+    for _, row in df.iterrows():
+        voter_data = {
+            'email': row['email'],
+            'gender': row['gender'],
+            'added_by_id': admin.id,
+            'full_name': row['full_name'],
+            'department': row['department'],
+            'id': f'voter_{shortuuid.uuid()}',
+            'matriculation_number': str(row['matriculation_number']),
+        }
+        voters_to_create.append(Voter(**voter_data))
+        if len(voters_to_create) >= BATCH_SIZE:
+            valid_records += batch_create_voters(voters_to_create)
+            voters_to_create = []
+    if voters_to_create:
+        valid_records += batch_create_voters(voters_to_create)
+    return valid_records
+
+
+def columnar_ingest(path: Path, admin, load_voters) -> int:
+    import pandas as pd
+
+    from django.db import transaction
+
+    from api.ingestion import prepare_voters
+
+    voters, _ = prepare_voters(pd.read_csv(path, dtype=str), added_by_id=admin.id)
+    with transaction.atomic():
+        return load_voters(voters)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--data-dir', type=Path, default=Path('.benchmark-data'))
+    args = parser.parse_args()
+
+    setup_django()
+    path = make_roster(args.rows, args.data_dir)
+
+    from django.db import connection
+
+    from api.models import Voter
+    from api.loaders import orm_load_voters, copy_load_voters
+
+    with test_database():
+        admin = make_admin()
+        cases = [
+            ('legacy iterrows', legacy_ingest),
+            ('columnar + bulk_create', partial(columnar_ingest, load_voters=orm_load_voters)),
+        ]
+        if connection.vendor == 'postgresql':
+            cases.append(('columnar + COPY', partial(columnar_ingest, load_voters=copy_load_voters)))
+
+        for label, ingest in cases:
+            Voter.objects.all().delete()
+            with timed(label, rows=args.rows):
+                ingest(path, admin)
+
+
+if __name__ == '__main__':
+    main()
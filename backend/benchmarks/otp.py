@@ -0,0 +1,117 @@
+"""
+Load test the sign-in endpoints: ``request-otp`` followed by a wrong and a right ``verify-otp``.
+
+Every simulated admin signs in for the first time, which is the worst case: the admin row is
+created on the successful verification. Throttling is disabled and ``send_email`` is replaced
+by a stub that keeps the codes, so only the endpoints themselves are measured. The cache is
+the configured one, so point ``CACHE_URL`` at Redis to measure the atomic Lua path.
+
+Usage:
+    python -m benchmarks.otp --admins 2000 --concurrency 8
+"""
+
+import time
+import argparse
+import threading
+from unittest import mock
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import setup_django, test_database
+
+
+class EndpointStats:
+    """Latencies and query counts per endpoint, collected from several threads."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.queries = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def record(self, endpoint: str, elapsed: float, queries: int):
+        with self.lock:
+            self.latencies[endpoint].append(elapsed)
+            self.queries[endpoint] += queries
+
+
+def percentile(values: list[float], percent: int) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return values[max(round(len(values) * percent / 100) - 1, 0)]
+
+
+def sign_in(index: int, codes: dict, stats: EndpointStats):
+    from django.db import connection
+    from django.test import Client
+
+    client = Client()
+    email = f'admin{index}@example.com'
+    queries = 0
+
+    def count_query(execute, sql, params, many, context):
+        nonlocal queries
+        queries += 1
+        return execute(sql, params, many, context)
+
+    def call(endpoint: str, data: dict, expected: int):
+        nonlocal queries
+        queries = 0
+        start = time.perf_counter()
+        response = client.post(f'/api/auth/{endpoint}', data, content_type='application/json')
+        stats.record(endpoint if expected == 200 else f'{endpoint} (wrong code)', time.perf_counter() - start, queries)
+        if response.status_code != expected:
+            msg = f'{endpoint} returned {response.status_code}: {response.content}'
+            raise RuntimeError(msg)
+
+    with connection.execute_wrapper(count_query):
+        call('request-otp', {'email': email}, 200)
+        wrong = '000000' if codes[email] != '000000' else '111111'
+        call('verify-otp', {'email': email, 'otp': wrong}, 400)
+        call('verify-otp', {'email': email, 'otp': codes[email]}, 200)
+    connection.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--admins', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import connection
+    from django.core.cache import caches
+
+    from api.views import RequestOtpAPIView
+
+    # the in-memory SQLite test database locks whole tables, so concurrent sign-ins would just fail
+    concurrency = 1 if connection.vendor == 'sqlite' else args.concurrency
+
+    codes = {}
+    stats = EndpointStats()
+
+    def keep_code(to: str, context: dict, **_kwargs):
+        codes[to] = context['otp']
+
+    print(f'cache backend: {type(caches["default"]).__name__}, {concurrency} concurrent clients')
+    with (
+        test_database(),
+        mock.patch.object(RequestOtpAPIView, 'throttle_classes', []),
+        mock.patch('api.views.send_email', keep_code),
+        ThreadPoolExecutor(max_workers=concurrency) as pool,
+    ):
+        start = time.perf_counter()
+        list(pool.map(lambda index: sign_in(index, codes, stats), range(args.admins)))
+        elapsed = time.perf_counter() - start
+
+    print(f'{args.admins} sign-ins in {elapsed:.2f}s ({args.admins / elapsed:,.0f} sign-ins/s)')
+    for endpoint, latencies in stats.latencies.items():
+        latencies.sort()
+        print(
+            f'{endpoint:<30} p50 {percentile(latencies, 50) * 1000:6.2f}ms  '
+            f'p95 {percentile(latencies, 95) * 1000:6.2f}ms  p99 {percentile(latencies, 99) * 1000:6.2f}ms  '
+            f'{stats.queries[endpoint] / len(latencies):.1f} queries/request'
+        )
+
+
+if __name__ == '__main__':
+    main()
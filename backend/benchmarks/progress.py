@@ -0,0 +1,100 @@
+"""
+Measure how many progress writes an upload makes for different checkpoint intervals.
+
+An interval of 0 flushes after every committed chunk, which is how progress used to be
+written. Every other interval only flushes when that many milliseconds have passed.
+
+Usage:
+    python -m benchmarks.progress --rows 100000 --chunk-size 1000 --intervals 0 250 1000
+"""
+
+import time
+import logging
+import argparse
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.common import make_admin, make_roster, setup_django, test_database
+
+
+class ProgressWrites:
+    """Count the progress ``UPDATE`` statements and log lines of an upload."""
+
+    def __init__(self):
+        self.updates = 0
+        self.log_lines = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        if sql.startswith('UPDATE "api_voterupload" SET "processed_records"'):
+            self.updates += 1
+        return execute(sql, params, many, context)
+
+    def count_log_line(self, record):
+        self.log_lines += 1
+        return False
+
+
+def run_upload(path: Path, admin, chunk_size: int, interval: int) -> tuple[float, ProgressWrites]:
+    from django.db import connection
+    from django.conf import settings
+    from django.core.files import File
+    from django.test.utils import override_settings
+
+    from api.tasks import process_upload
+    from api.models import Voter, VoterUpload
+
+    Voter.objects.all().delete()
+    with path.open('rb') as file:
+        upload = VoterUpload.objects.create(user=admin, file=File(file, name=path.name), status='processing')
+
+    writes = ProgressWrites()
+    logger = logging.getLogger('api.progress')
+    logger.addFilter(writes.count_log_line)
+    level = logger.level
+    logger.setLevel(logging.INFO)  # filters only see records of enabled levels
+    voter_upload = {**settings.VOTER_UPLOAD, 'CHUNK_SIZE': chunk_size, 'PROGRESS_FLUSH_INTERVAL': interval}
+
+    try:
+        with override_settings(VOTER_UPLOAD=voter_upload), connection.execute_wrapper(writes):
+            start = time.perf_counter()
+            process_upload.call_local(upload.id)
+            elapsed = time.perf_counter() - start
+    finally:
+        logger.removeFilter(writes.count_log_line)
+        logger.setLevel(level)
+
+    upload.refresh_from_db()
+    upload.file.delete()
+    if upload.status != 'completed':
+        msg = f'Upload failed: {upload.reason}'
+        raise RuntimeError(msg)
+    return elapsed, writes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--intervals', type=int, nargs='+', default=[0, 250, 1000])
+    parser.add_argument('--data-dir', type=Path, default=Path('.benchmark-data'))
+    args = parser.parse_args()
+
+    setup_django()
+    path = make_roster(args.rows, args.data_dir)
+
+    from huey.contrib.djhuey import HUEY
+
+    HUEY.immediate = True
+
+    with test_database(), mock.patch('api.tasks.send_email'):
+        admin = make_admin()
+        for interval in args.intervals:
+            elapsed, writes = run_upload(path, admin, args.chunk_size, interval)
+            print(
+                f'{interval:>5} ms interval {elapsed:8.2f}s ({args.rows / elapsed:,.0f} rows/s) '
+                f'{writes.updates:>5} progress updates {writes.log_lines:>5} log lines'
+            )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Check that the voter and upload list queries are served by their indexes at scale.
+
+Seeds several admins with voters and uploads, then prints the PostgreSQL plan and timing of
+each list query and fails if the expected index isn't used. Requires a PostgreSQL
+``DATABASE_URL``.
+
+Usage:
+    python -m benchmarks.query_plans --admins 20 --voters-per-admin 10000
+"""
+
+import time
+import argparse
+
+from benchmarks.common import make_admin, setup_django, test_database
+
+VOTER_INDEX = 'voter_added_by_created_idx'
+DEPARTMENT_INDEX = 'voter_added_by_department_idx'
+FULL_NAME_INDEX = 'voter_added_by_full_name_idx'
+SEARCH_INDEX = 'voter_full_name_trgm_idx'
+UPLOAD_INDEX = 'voterupload_user_created_idx'
+DEPARTMENTS = ['Physics', 'Chemistry', 'Mathematics', 'Economics', 'History', 'Law', 'Medicine', 'Music']
+
+
+def seed(admins: int, voters_per_admin: int, uploads_per_admin: int) -> list:
+    import pandas as pd
+
+    from django.db import connection, transaction
+
+    from api.models import VoterUpload
+    from api.loaders import get_voter_loader
+    from api.ingestion import prepare_voters
+
+    owners = [make_admin(f'admin{index}@example.com') for index in range(admins)]
+    for number, owner in enumerate(owners):
+        offset = number * voters_per_admin
+        frame = pd.DataFrame(
+            {
+                'email': [f'voter{offset + index}@example.com' for index in range(voters_per_admin)],
+                'gender': 'F',
+                'full_name': [f'Voter {offset + index}' for index in range(voters_per_admin)],
+                'department': [DEPARTMENTS[index % len(DEPARTMENTS)] for index in range(voters_per_admin)],
+                'matriculation_number': [f'{offset + index:09d}' for index in range(voters_per_admin)],
+            }
+        )
+        voters, _ = prepare_voters(frame, added_by_id=owner.id)
+        with transaction.atomic():
+            get_voter_loader()(voters)
+
+        VoterUpload.objects.bulk_create(
+            VoterUpload(id=f'upload_{number}_{index}', user=owner, file='voters/seed.csv')
+            for index in range(uploads_per_admin)
+        )
+
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE api_voter')
+        cursor.execute('ANALYZE api_voterupload')
+    return owners
+
+
+def check_plan(label: str, queryset, index: str):
+    plan = queryset.explain(analyze=True)
+    start = time.perf_counter()
+    rows = len(list(queryset))
+    elapsed = time.perf_counter() - start
+
+    print(f'== {label}: {rows:,} rows in {elapsed * 1000:.1f} ms')
+    print(plan)
+    if index not in plan:
+        msg = f'{label} does not use {index}'
+        raise AssertionError(msg)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--admins', type=int, default=20)
+    parser.add_argument('--voters-per-admin', type=int, default=10_000)
+    parser.add_argument('--uploads-per-admin', type=int, default=500)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from django.db import connection
+    from django.test import RequestFactory
+    from django.db.models import Q
+
+    from rest_framework.request import Request
+
+    from api.views import VotersAPIView, VoterUploadListView
+    from api.models import Voter, VoterUpload
+    from api.pagination import KeysetPagination
+
+    if connection.vendor != 'postgresql':
+        msg = 'Query plans are only checked on PostgreSQL'
+        raise SystemExit(msg)
+
+    with test_database():
+        owner = seed(args.admins, args.voters_per_admin, args.uploads_per_admin)[0]
+
+        def view_queryset(view_class, query: str = ''):
+            view = view_class()
+            view.request = Request(RequestFactory().get(f'/?{query}'))
+            view.request.user = owner
+            return view.filter_queryset(view.get_queryset())
+
+        voters = view_queryset(VotersAPIView)
+        check_plan('voter list', voters, VOTER_INDEX)
+
+        # the query KeysetPagination runs for a page deep into the list
+        last = voters[args.voters_per_admin // 2]
+        page = voters.filter(Q(created_at__lt=last.created_at) | Q(created_at=last.created_at, id__lt=last.id))
+        check_plan('voter page', page[: KeysetPagination.default_limit + 1], VOTER_INDEX)
+
+        limit = KeysetPagination.default_limit + 1
+        check_plan('department filter', view_queryset(VotersAPIView, 'department=Law')[:limit], DEPARTMENT_INDEX)
+        check_plan('sorted by name', view_queryset(VotersAPIView, 'ordering=full_name')[:limit], FULL_NAME_INDEX)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            has_trigrams = cursor.fetchone() is not None
+        if has_trigrams:
+            search = view_queryset(VotersAPIView, f'search=Voter {args.voters_per_admin // 3}')
+            check_plan('name search', search, SEARCH_INDEX)
+        else:
+            print('== name search: skipped, pg_trgm is not installed')
+
+        check_plan('upload list', view_queryset(VoterUploadListView), UPLOAD_INDEX)
+        print(f'{VoterUpload.objects.count():,} uploads and {Voter.objects.count():,} voters seeded')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+"""
+Simulate upload scheduling to compare first-come-first-served dispatch with priority lanes and fair share.
+
+Jobs are modelled from their row count only: a worker ingests ``--rows-per-second`` rows,
+large files are split into shards of ``--shard-rows`` rows, and every task costs a fixed
+overhead. One admin drops a few very large rosters while many other admins upload small
+ones. The fair-share run uses ``get_upload_priority`` and ``pick_fair_share`` exactly as
+``claim_pending_uploads`` does.
+
+Usage:
+    python -m benchmarks.scheduling --workers 5 --small-uploads 300
+"""
+
+import math
+import heapq
+import random
+import argparse
+import itertools
+from collections import Counter
+from dataclasses import dataclass
+
+from benchmarks.common import setup_django
+
+
+@dataclass
+class Job:
+    id: str
+    admin: str
+    rows: int
+    arrival: float
+    finished: float = 0.0
+    remaining: int = 0
+
+
+def make_jobs(args) -> list[Job]:
+    rng = random.Random(args.seed)
+    jobs = [
+        Job(f'large-{index}', 'bulk-admin', args.large_rows, arrival=index * 5.0)
+        for index in range(args.large_uploads)
+    ]
+
+    arrival = 0.0
+    for index in range(args.small_uploads):
+        arrival += rng.expovariate(args.small_uploads / args.horizon)
+        rows = rng.randint(5_000, 50_000) if index % 10 == 0 else rng.randint(50, 5_000)  # a few medium files
+        jobs.append(Job(f'small-{index}', f'admin-{rng.randrange(args.admins)}', rows, arrival))
+    return sorted(jobs, key=lambda job: job.arrival)
+
+
+def simulate(jobs: list[Job], args, fair_share: bool) -> list[Job]:
+    from api.scheduling import pick_fair_share, get_upload_priority
+
+    jobs = [Job(job.id, job.admin, job.rows, job.arrival) for job in jobs]
+    sequence = itertools.count()
+    events = [(job.arrival, next(sequence), 'arrival', job) for job in jobs]
+    heapq.heapify(events)
+    queue, pending, active, free_workers = [], [], Counter(), args.workers
+
+    def dispatch():
+        if fair_share:
+            candidates = sorted(pending, key=lambda job: (job.rows, job.arrival))
+            picked = dict(
+                pick_fair_share(((job.id, job.admin) for job in candidates), active, len(pending), args.per_admin)
+            )
+            claimed = [job for job in candidates if job.id in picked]
+        else:
+            claimed = list(pending)
+
+        for job in claimed:
+            pending.remove(job)
+            priority = get_upload_priority(job.rows) if fair_share else 0
+            shards = min(math.ceil(job.rows / args.shard_rows), args.workers)
+            job.remaining = shards
+            for _ in range(shards):
+                duration = args.task_overhead + job.rows / shards / args.rows_per_second
+                heapq.heappush(queue, (-priority, next(sequence), job, duration))
+
+    while events:
+        now, _, kind, job = heapq.heappop(events)
+        if kind == 'arrival':
+            pending.append(job)
+        else:
+            free_workers += 1
+            job.remaining -= 1
+            if job.remaining == 0:
+                job.finished = now
+                active[job.admin] -= 1
+        dispatch()
+
+        while free_workers and queue:
+            _, _, started, duration = heapq.heappop(queue)
+            free_workers -= 1
+            heapq.heappush(events, (now + duration, next(sequence), 'done', started))
+
+    return jobs
+
+
+def percentile(values: list[float], percent: int) -> float:
+    """Nearest-rank percentile of sorted values."""
+    return values[max(math.ceil(percent / 100 * len(values)) - 1, 0)]
+
+
+def report(label: str, jobs: list[Job]):
+    latencies = sorted(job.finished - job.arrival for job in jobs)
+    print(
+        f'{label:<45} p50 {percentile(latencies, 50):7.1f}s  p95 {percentile(latencies, 95):7.1f}s  '
+        f'p99 {percentile(latencies, 99):7.1f}s  max {latencies[-1]:7.1f}s'
+    )
+
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--workers', type=int, default=5)
+    parser.add_argument('--per-admin', type=int, default=2)
+    parser.add_argument('--admins', type=int, default=40)
+    parser.add_argument('--large-uploads', type=int, default=4)
+    parser.add_argument('--large-rows', type=int, default=1_000_000)
+    parser.add_argument('--small-uploads', type=int, default=300)
+    parser.add_argument('--horizon', type=float, default=600, help='seconds over which the small uploads arrive')
+    parser.add_argument('--rows-per-second', type=float, default=15_000)
+    parser.add_argument('--shard-rows', type=int, default=100_000)
+    parser.add_argument('--task-overhead', type=float, default=0.5)
+    parser.add_argument('--seed', type=int, default=7)
+    return parser
+
+
+def main():
+    args = make_parser().parse_args()
+
+    setup_django()
+    jobs = make_jobs(args)
+
+    for label, fair_share in [('first come, first served', False), ('priority lanes + fair share', True)]:
+        finished = simulate(jobs, args, fair_share)
+        report(f'{label}: small uploads', [job for job in finished if job.admin != 'bulk-admin'])
+        report(f'{label}: large uploads', [job for job in finished if job.admin == 'bulk-admin'])
+
+
+if __name__ == '__main__':
+    main()
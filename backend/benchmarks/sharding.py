@@ -0,0 +1,83 @@
+"""
+Measure the throughput of sharded upload processing for different numbers of Huey workers.
+
+Uploads are split into one shard per worker and processed by an in-process thread consumer,
+the worker type the project runs in production. Use a PostgreSQL ``DATABASE_URL``: SQLite
+serializes writers, so extra workers can't help there.
+
+Usage:
+    python -m benchmarks.sharding --rows 500000 --workers 1 2 4 5
+"""
+
+import math
+import time
+import argparse
+from pathlib import Path
+from unittest import mock
+
+from benchmarks.common import make_admin, make_roster, setup_django, test_database
+
+
+def run_upload(path: Path, admin, workers: int) -> float:
+    from huey.contrib.djhuey import HUEY
+
+    from django.conf import settings
+    from django.core.files import File
+    from django.test.utils import override_settings
+
+    from api.tasks import process_upload
+    from api.models import Voter, VoterUpload
+
+    Voter.objects.all().delete()
+    with path.open('rb') as file:
+        upload = VoterUpload.objects.create(user=admin, file=File(file, name=path.name), status='processing')
+
+    voter_upload = {
+        **settings.VOTER_UPLOAD,
+        'MAX_SHARDS': workers,
+        'SHARD_SIZE': math.ceil(path.stat().st_size / workers),
+    }
+    consumer = HUEY.create_consumer(workers=workers, worker_type='thread', periodic=False, max_delay=0.05)
+
+    with override_settings(VOTER_UPLOAD=voter_upload):
+        consumer.start()
+        start = time.perf_counter()
+        process_upload(upload.id)
+        while VoterUpload.objects.filter(id=upload.id, status__in=['pending', 'processing']).exists():
+            time.sleep(0.05)
+        elapsed = time.perf_counter() - start
+        consumer.stop(graceful=True)
+
+    upload.refresh_from_db()
+    upload.file.delete()
+    if upload.status != 'completed':
+        msg = f'Upload failed: {upload.reason}'
+        raise RuntimeError(msg)
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=500_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 5])
+    parser.add_argument('--data-dir', type=Path, default=Path('.benchmark-data'))
+    args = parser.parse_args()
+
+    setup_django()
+    path = make_roster(args.rows, args.data_dir)
+
+    from huey.contrib.djhuey import HUEY
+
+    # the consumer threads share an in-memory queue with the benchmark itself
+    HUEY.immediate = False
+    HUEY.storage = HUEY.get_immediate_storage()
+
+    with test_database(), mock.patch('api.tasks.send_email'):
+        admin = make_admin()
+        for workers in args.workers:
+            elapsed = run_upload(path, admin, workers)
+            print(f'{workers} worker(s) {elapsed:8.2f}s ({args.rows / elapsed:,.0f} rows/s)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+"""
+Compare the dashboard statistics read from ``VoterCount`` with counting the voters table.
+
+Voters are inserted with ``batch_create_voters`` in chunks like an upload, timing how much of
+it goes into keeping the counts up to date. Both reads must return the same counts; the
+benchmark checks that before timing them.
+
+Usage:
+    python -m benchmarks.stats --rows 1000000 --departments 40
+"""
+
+import time
+import argparse
+from unittest import mock
+
+from benchmarks.common import timed, make_admin, setup_django, test_database
+
+CHUNK_SIZE = 10_000
+READS = 20
+
+
+def insert_voters(admin, rows: int, departments: int):
+    import pandas as pd
+
+    from api.tasks import batch_create_voters
+    from api.ingestion import prepare_voters
+
+    for start in range(0, rows, CHUNK_SIZE):
+        indexes = range(start, min(start + CHUNK_SIZE, rows))
+        frame = pd.DataFrame(
+            {
+                'email': [f'voter{index}@example.com' for index in indexes],
+                'gender': [('F', 'M')[index % 2] for index in indexes],
+                'full_name': [f'Voter {index}' for index in indexes],
+                'department': [f'Department {index % departments}' for index in indexes],
+                'matriculation_number': [f'{index:09d}' for index in indexes],
+            }
+        )
+        voters, _ = prepare_voters(frame, added_by_id=admin.id)
+        batch_create_voters(voters)
+
+
+def count_voters_table(admin_id: str) -> dict:
+    """The counts as they would be computed without the summary table."""
+    from django.db.models import Count
+
+    from api.models import Voter
+
+    groups = Voter.objects.filter(added_by_id=admin_id).values_list('department', 'gender')
+    return {(department, gender): count for department, gender, count in groups.annotate(count=Count('id')).order_by()}
+
+
+def count_summary_table(admin_id: str) -> dict:
+    from api.stats import get_voter_stats
+
+    stats = get_voter_stats(admin_id)
+    return {
+        (summary['department'], gender): count
+        for summary in stats['departments']
+        for gender, count in summary['genders'].items()
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--departments', type=int, default=40)
+    args = parser.parse_args()
+
+    setup_django()
+
+    from api import tasks
+
+    counting = 0.0
+    count_inserted_voters = tasks.count_inserted_voters
+
+    def timed_count(voters, inserted: int):
+        nonlocal counting
+        start = time.perf_counter()
+        count_inserted_voters(voters, inserted)
+        counting += time.perf_counter() - start
+
+    with test_database():
+        admin = make_admin()
+        with mock.patch.object(tasks, 'count_inserted_voters', timed_count), timed('insert', rows=args.rows):
+            insert_voters(admin, args.rows, args.departments)
+        print(f'{"  of which updating counts":<40} {counting:8.3f}s')
+
+        from api.stats import rebuild_voter_counts
+
+        with timed('rebuild_voter_counts'):
+            rebuild_voter_counts()
+
+        expected = count_voters_table(admin.id)
+        if count_summary_table(admin.id) != expected:
+            msg = 'The summary table does not match the voters table'
+            raise AssertionError(msg)
+
+        for label, read in [('count voters table', count_voters_table), ('read VoterCount', count_summary_table)]:
+            start = time.perf_counter()
+            for _ in range(READS):
+                read(admin.id)
+            print(f'{label:<40} {(time.perf_counter() - start) / READS * 1000:8.2f} ms per read')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Compare rendering the voters list through ``VoterSerializer`` with the ``values()`` + orjson fast path.
+
+Both paths must produce the same bytes; the benchmark checks that before timing them.
+
+Usage:
+    python -m benchmarks.voters_list --sizes 10000 100000
+"""
+
+import time
+import argparse
+import tracemalloc
+
+from benchmarks.common import make_admin, setup_django, test_database
+
+
+def create_voters(admin, count: int):
+    import pandas as pd
+
+    from django.db import transaction
+
+    from api.loaders import get_voter_loader
+    from api.ingestion import prepare_voters
+
+    frame = pd.DataFrame(
+        {
+            'email': [f'voter{index}@example.com' for index in range(count)],
+            'gender': ['F', 'M'] * (count // 2) + ['F'] * (count % 2),
+            # non-ASCII names with a line separator, which JSONRenderer escapes
+            'full_name': [f'Ọlá\u2028Voter {index}' for index in range(count)],
+            'department': 'Computer Science',
+            'matriculation_number': [f'{index:08d}' for index in range(count)],
+        }
+    )
+    voters, _ = prepare_voters(frame, added_by_id=admin.id)
+    with transaction.atomic():
+        get_voter_loader()(voters)
+
+
+def render_with_serializer(queryset) -> bytes:
+    from rest_framework.renderers import JSONRenderer
+
+    from api.serializers import VoterSerializer
+
+    return JSONRenderer().render({'success': True, 'data': VoterSerializer(queryset, many=True).data})
+
+
+def render_fast(queryset) -> bytes:
+    from api.renderers import render_json
+    from api.serializers import VoterSerializer
+
+    return render_json({'success': True, 'data': list(queryset.values(*VoterSerializer.Meta.fields))})
+
+
+def measure(render, queryset) -> tuple[bytes, float, float]:
+    start = time.perf_counter()
+    content = render(queryset.all())
+    elapsed = time.perf_counter() - start
+
+    # allocations are traced in a second run because tracing slows everything down
+    tracemalloc.start()
+    render(queryset.all())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return content, elapsed, peak / 1_048_576
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    args = parser.parse_args()
+
+    setup_django()
+
+    from api.models import Voter
+
+    with test_database():
+        admin = make_admin()
+        for size in args.sizes:
+            Voter.objects.all().delete()
+            create_voters(admin, size)
+            queryset = Voter.objects.filter(added_by_id=admin.id)
+
+            expected, *serializer_stats = measure(render_with_serializer, queryset)
+            content, *fast_stats = measure(render_fast, queryset)
+            if content != expected:
+                msg = 'The fast path does not render the same bytes as the serializer'
+                raise AssertionError(msg)
+
+            for label, (elapsed, peak) in [('serializer', serializer_stats), ('values + orjson', fast_stats)]:
+                print(f'{size:>8,} voters  {label:<16} {elapsed * 1000:9.1f} ms  {peak:8.1f} MiB allocated at peak')
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,122 @@
+import time
+import logging
+import threading
+from collections import OrderedDict
+
 import jwt
 
 from django.conf import settings
+from django.core.cache import cache
 
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.authentication import BaseAuthentication
 
 from api.models import Admin
 
+logger = logging.getLogger(__name__)
+
+
+class AuthCache:
+    """
+    Two-level cache of the admins behind verified access tokens.
+
+    The first level is a per-process LRU of token -> ``Admin`` capped at ``MAX_SIZE`` entries.
+    An entry lives until the token's ``exp`` or for ``LOCAL_TTL`` seconds, whichever comes
+    first, so a hit skips both the signature check and the database. The second level is the
+    Django cache, shared by every worker, which holds admins by id for ``SHARED_TTL`` seconds
+    so that a token seen for the first time by a worker still doesn't need a query.
+
+    ``invalidate`` drops an admin from the shared cache and from this process; other processes
+    pick up the change within ``LOCAL_TTL`` seconds.
+    """
+
+    key_prefix = 'auth:admin:'
+
+    def __init__(self, max_size: int, local_ttl: int, shared_ttl: int, stats_interval: int):
+        self.max_size = max_size
+        self.local_ttl = local_ttl
+        self.shared_ttl = shared_ttl
+        self.stats_interval = stats_interval
+        self._entries: OrderedDict[str, tuple[Admin, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.reset_stats()
+
+    def get(self, token: str) -> Admin | None:
+        """Return the admin cached for ``token`` in this process, if it hasn't expired."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[1] <= time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[0]
+
+    def set(self, token: str, user: Admin, expires_at: float):
+        with self._lock:
+            self._entries[token] = (user, min(expires_at, time.time() + self.local_ttl))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_admin(self, user_id: str) -> Admin:
+        """Load an admin from the shared cache, falling back to the database."""
+        user = cache.get(f'{self.key_prefix}{user_id}')
+        if user is not None:
+            self.record('shared_hits')
+            return user
+
+        self.record('misses')
+        user = Admin.objects.get(id=user_id)
+        cache.set(f'{self.key_prefix}{user_id}', user, timeout=self.shared_ttl)
+        return user
+
+    def invalidate(self, user_id: str):
+        """Forget every cached token of an admin, e.g. after it was changed or deleted."""
+        cache.delete(f'{self.key_prefix}{user_id}')
+        with self._lock:
+            for token in [token for token, (user, _) in self._entries.items() if user.id == user_id]:
+                del self._entries[token]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def record(self, outcome: str):
+        with self._lock:
+            self._stats[outcome] += 1
+            lookups = sum(self._stats.values())
+        if self.stats_interval and lookups % self.stats_interval == 0:
+            stats = self.stats()
+            logger.info(
+                f'Auth cache hit rate {stats["hit_rate"]:.1%} over {stats["lookups"]} lookups '
+                f'({stats["local_hits"]} local, {stats["shared_hits"]} shared, {stats["misses"]} misses)'
+            )
+
+    def stats(self) -> dict:
+        """Return this process's hit counters and overall hit rate."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._entries)
+        stats['lookups'] = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = (
+            (stats['local_hits'] + stats['shared_hits']) / stats['lookups'] if stats['lookups'] else 0.0
+        )
+        return stats
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {'local_hits': 0, 'shared_hits': 0, 'misses': 0}
+
+
+auth_cache = AuthCache(
+    max_size=settings.AUTH_CACHE['MAX_SIZE'],
+    local_ttl=settings.AUTH_CACHE['LOCAL_TTL'],
+    shared_ttl=settings.AUTH_CACHE['SHARED_TTL'],
+    stats_interval=settings.AUTH_CACHE['STATS_INTERVAL'],
+)
+
 
 class JWTAuthentication(BaseAuthentication):
     def authenticate(self, request):
@@ -16,6 +126,20 @@ class JWTAuthentication(BaseAuthentication):
 
         try:
             token = auth_header.split()[1]
+        except IndexError as e:
+            msg = 'Invalid token'
+            raise AuthenticationFailed(msg) from e
+
+        return (self.authenticate_token(token), token)
+
+    def authenticate_token(self, token: str) -> Admin:
+        """Return the admin a token was issued to, raising ``AuthenticationFailed`` if it isn't valid."""
+        user = auth_cache.get(token)
+        if user is not None:
+            auth_cache.record('local_hits')
+            return user
+
+        try:
             payload = jwt.decode(
                 jwt=token,
                 key=settings.JWT_AUTH['JWT_SECRET_KEY'],
@@ -29,9 +153,10 @@ class JWTAuthentication(BaseAuthentication):
             raise AuthenticationFailed(msg) from e
 
         try:
-            user = Admin.objects.get(id=payload['user_id'])
+            user = auth_cache.get_admin(payload['user_id'])
         except Admin.DoesNotExist as e:
             msg = 'User not found'
             raise AuthenticationFailed(msg) from e
 
-        return (user, token)
+        auth_cache.set(token, user, expires_at=payload['exp'])
+        return user
@@ -212,17 +212,84 @@ JWT_AUTH = {
     'JWT_REFRESH_EXPIRATION_DELTA': timedelta(days=14),  # not safe. just for testing purposes
 }
 
+# verified tokens are cached per process and admins are shared through the cache, see core.authentication
+AUTH_CACHE = {
+    'MAX_SIZE': env.int('AUTH_CACHE_MAX_SIZE', 10_000),  # tokens kept per process
+    'LOCAL_TTL': env.int('AUTH_CACHE_LOCAL_TTL', 60),  # seconds before a process re-reads an admin
+    'SHARED_TTL': env.int('AUTH_CACHE_SHARED_TTL', 900),  # seconds an admin stays in the shared cache
+    'STATS_INTERVAL': env.int('AUTH_CACHE_STATS_INTERVAL', 10_000),  # log the hit rate every N lookups; 0 disables it
+}
+
+# one-time passwords live in the cache only, see api.otp
+OTP = {
+    'LENGTH': 6,
+    'TTL': env.int('OTP_TTL', 900),  # seconds a code stays valid
+    'MAX_ATTEMPTS': env.int('OTP_MAX_ATTEMPTS', 5),  # wrong guesses before a code is dropped
+}
 
 # ==============================================================================
 # RESEND SETTINGS
 # ==============================================================================
 PLUNK_API_KEY = env.str('PLUNK_API_KEY')
 
+EMAIL = {
+    'BACKEND': env.str('EMAIL_BACKEND', 'api.emails.PlunkBackend'),  # api.emails.MemoryBackend keeps emails in memory
+    'API_URL': env.str('EMAIL_API_URL', 'https://api.useplunk.com/v1'),
+    'CONNECT_TIMEOUT': env.float('EMAIL_CONNECT_TIMEOUT', 3.05),
+    'READ_TIMEOUT': env.float('EMAIL_READ_TIMEOUT', 10),
+    'POOL_SIZE': env.int('EMAIL_POOL_SIZE', 10),  # keep-alive connections per process, at least one per Huey worker
+    'RETRIES': env.int('EMAIL_RETRIES', 5),
+    'RETRY_DELAY': env.int('EMAIL_RETRY_DELAY', 10),  # seconds before the first retry, doubled for every next one
+    'MAX_RETRY_DELAY': env.int('EMAIL_MAX_RETRY_DELAY', 600),
+}
+
 
 # ==============================================================================
 # HUEY SETTINGS
 # ==============================================================================
-HUEY = {'name': 'dwst-app', 'url': env.str('CACHE_URL'), 'consumer': {'workers': 5}, 'immediate': False}
+HUEY = {
+    'huey_class': 'huey.PriorityRedisHuey',  # supports task priorities, requires Redis 5+
+    'name': 'dwst-app',
+    'url': env.str('CACHE_URL'),
+    'consumer': {'workers': 5},
+    'immediate': False,
+}
+
+# ==============================================================================
+# VOTER UPLOAD SETTINGS
+# ==============================================================================
+VOTER_UPLOAD = {
+    'CHUNK_SIZE': env.int('VOTER_UPLOAD_CHUNK_SIZE', 10_000),  # rows read from an uploaded file at a time
+    'SHARD_SIZE': env.int('VOTER_UPLOAD_SHARD_SIZE', 8_388_608),  # 8MB of CSV per sub-task
+    'MAX_SHARDS': env.int('VOTER_UPLOAD_MAX_SHARDS', HUEY['consumer']['workers']),
+    # processes parsing and validating uploads while Huey workers write to the database; 0 disables it
+    'PARSER_POOL_SIZE': env.int('VOTER_UPLOAD_PARSER_POOL_SIZE', 0),
+    'PARSER_QUEUE_DEPTH': env.int('VOTER_UPLOAD_PARSER_QUEUE_DEPTH', 4),  # parsed chunks waiting to be written
+    'CLAIM_BATCH_SIZE': env.int('VOTER_UPLOAD_CLAIM_BATCH_SIZE', 100),  # pending uploads dispatched per scheduler run
+    # existing voters whose keys load in the time one key is looked up; uploads with fewer rows than the voters
+    # table divided by this look up each chunk's keys instead of loading every existing voter's
+    'DEDUPE_LOOKUP_COST': env.int('VOTER_UPLOAD_DEDUPE_LOOKUP_COST', 10),
+    # existing voters above which duplicates are looked up in Bloom filters instead of exact sets
+    'DEDUPE_BLOOM_THRESHOLD': env.int('VOTER_UPLOAD_DEDUPE_BLOOM_THRESHOLD', 500_000),
+    'DEDUPE_FALSE_POSITIVE_RATE': env.float('VOTER_UPLOAD_DEDUPE_FALSE_POSITIVE_RATE', 0.001),  # rows checked in vain
+    'MAX_ACTIVE_PER_ADMIN': env.int('VOTER_UPLOAD_MAX_ACTIVE_PER_ADMIN', 2),  # uploads of one admin processed at once
+    # (max estimated records, Huey priority): smaller uploads are processed first; larger ones get priority 0
+    'PRIORITY_LANES': [(10_000, 20), (200_000, 10)],
+    # uploads up to this many bytes are dispatched as soon as they are received; 0 leaves them all to the scheduler
+    'IMMEDIATE_MAX_SIZE': env.int('VOTER_UPLOAD_IMMEDIATE_MAX_SIZE', 8_388_608),
+    # progress is written at most once per committed chunk and once per this many milliseconds
+    'PROGRESS_FLUSH_INTERVAL': env.int('VOTER_UPLOAD_PROGRESS_FLUSH_INTERVAL', 1000),
+    'PROGRESS_TTL': env.int('VOTER_UPLOAD_PROGRESS_TTL', 86_400),  # seconds a progress event stays in the cache
+    'PROGRESS_POLL_INTERVAL': env.float('VOTER_UPLOAD_PROGRESS_POLL_INTERVAL', 0.5),  # seconds between cache reads
+    'PROGRESS_LONG_POLL_TIMEOUT': env.int('VOTER_UPLOAD_PROGRESS_LONG_POLL_TIMEOUT', 25),
+    'PROGRESS_STREAM_TIMEOUT': env.int('VOTER_UPLOAD_PROGRESS_STREAM_TIMEOUT', 300),  # clients reconnect after it
+    # seconds a progress stream token can be used to connect; it ends up in access logs, so keep it short
+    'PROGRESS_TOKEN_TTL': env.int('VOTER_UPLOAD_PROGRESS_TOKEN_TTL', 60),
+    # seconds without a checkpoint after which a shard's task is presumed dead and the shard is resumed elsewhere
+    'LEASE_TIMEOUT': env.int('VOTER_UPLOAD_LEASE_TIMEOUT', 300),
+    # seconds a claimed upload may wait in the queue before its process_upload message is presumed lost
+    'QUEUE_TIMEOUT': env.int('VOTER_UPLOAD_QUEUE_TIMEOUT', 3600),
+}
 
 # ==============================================================================
 # LOGGING SETTINGS
@@ -1,4 +1,5 @@
-import { useMutation, useQuery } from '@tanstack/react-query';
+import { useMutation, useQuery, useQueryClient } from '@tanstack/react-query';
+import { useEffect } from 'react';
 
 export const API_URL = import.meta.env.VITE_API_URL;
 export const VOTERS_URL = `${API_URL}/voters`;
@@ -6,6 +7,8 @@ export const AUTH_URL = `${API_URL}/auth`;
 
 export const UPLOAD_FILES_URL = `${VOTERS_URL}/uploads`;
 
+const PROGRESS_RECONNECT_DELAY = 1000; // milliseconds
+
 interface RequestOTPData {
   email: string;
 }
@@ -38,8 +41,15 @@ interface VoterUpload {
   updated_at: string;
   total_records: number;
   processed_records: number;
+  duplicate_records: number;
+  invalid_records: number;
 }
 
+type UploadProgress = Pick<
+  VoterUpload,
+  'id' | 'status' | 'reason' | 'total_records' | 'processed_records' | 'duplicate_records' | 'invalid_records'
+>;
+
 const apiFetch = async (url: string, options: RequestInit = {}) => {
   const token = localStorage.getItem('access_token');
   const headers = {
@@ -99,3 +109,76 @@ export const useVoterUploads = () => {
     queryFn: () => apiFetch(`${VOTERS_URL}/uploads/status`),
   });
 };
+
+export const useUploadProgress = (uploads: VoterUpload[] | undefined) => {
+  const queryClient = useQueryClient();
+  const activeIds = (uploads ?? [])
+    .filter((upload) => upload.status === 'pending' || upload.status === 'processing')
+    .map((upload) => upload.id)
+    .join(',');
+
+  useEffect(() => {
+    if (!activeIds || !localStorage.getItem('access_token')) {
+      return;
+    }
+
+    let closed = false;
+    const sources = new Map<string, EventSource>();
+
+    // EventSource can't send an Authorization header, so each stream is opened with a token that is only valid
+    // for that upload and for a minute, instead of putting the access token in the URL
+    const subscribe = async (id: string, after?: string) => {
+      let token: string;
+      try {
+        ({ token } = (await apiFetch(`${UPLOAD_FILES_URL}/${id}/progress-token`, { method: 'POST' })).data);
+      } catch {
+        return; // the upload is gone or the session expired
+      }
+      if (closed) {
+        return;
+      }
+
+      const query = new URLSearchParams({ token, ...(after ? { after } : {}) });
+      const source = new EventSource(`${UPLOAD_FILES_URL}/${id}/progress?${query}`);
+      sources.set(id, source);
+      let lastEventId = after;
+
+      source.addEventListener('progress', (event) => {
+        lastEventId = event.lastEventId;
+        const progress: UploadProgress = JSON.parse(event.data);
+        queryClient.setQueryData<{ success: boolean; data: VoterUpload[] }>(
+          ['voterUploads'],
+          (previous) =>
+            previous && {
+              ...previous,
+              data: previous.data.map((upload) => (upload.id === progress.id ? { ...upload, ...progress } : upload)),
+            },
+        );
+        if (progress.status === 'completed' || progress.status === 'failed') {
+          source.close();
+          sources.delete(id);
+          queryClient.invalidateQueries({ queryKey: ['voters'] });
+        }
+      });
+      // EventSource reconnects by itself with the same URL; once the token has expired that is refused,
+      // so the stream is reopened with a new token from the last event seen
+      source.addEventListener('error', () => {
+        if (source.readyState === EventSource.CLOSED && !closed) {
+          sources.delete(id);
+          setTimeout(() => subscribe(id, lastEventId), PROGRESS_RECONNECT_DELAY);
+        }
+      });
+    };
+
+    for (const id of activeIds.split(',')) {
+      subscribe(id);
+    }
+
+    return () => {
+      closed = true;
+      for (const source of sources.values()) {
+        source.close();
+      }
+    };
+  }, [activeIds, queryClient]);
+};
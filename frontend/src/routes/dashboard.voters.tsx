@@ -11,7 +11,7 @@ import { Input } from '@/components/ui/input';
 import { Progress } from '@/components/ui/progress';
 import { Skeleton } from '@/components/ui/skeleton';
 import { Table, TableBody, TableCell, TableHead, TableHeader, TableRow } from '@/components/ui/table';
-import { useVoterUploads, useVoters } from '@/lib/api';
+import { useUploadProgress, useVoterUploads, useVoters } from '@/lib/api';
 import { createFileRoute } from '@tanstack/react-router';
 import {
   type ColumnDef,
@@ -46,11 +46,13 @@ export const Route = createFileRoute('/dashboard/voters')({
 function VotersDashboard() {
   const { data: votersData, isLoading: isLoadingVoters } = useVoters();
   const { data: uploadsData, isLoading: isLoadingUploads, refetch: refetchUploads } = useVoterUploads();
+  useUploadProgress(uploadsData?.data);
 
+  // running uploads stream their progress; the list itself is only re-checked for new uploads
   useEffect(() => {
     const intervalId = setInterval(() => {
       refetchUploads();
-    }, 3000);
+    }, 30000);
 
     return () => clearInterval(intervalId);
   }, [refetchUploads]);
@@ -98,7 +100,14 @@ function VotersDashboard() {
                       </div>
                       <StatusBadge status={upload.status} />
                     </div>
-                    <Progress value={(upload.processed_records / upload.total_records) * 100} className="h-2 mb-2" />
+                    <Progress
+                      value={
+                        ((upload.processed_records + upload.duplicate_records + upload.invalid_records) /
+                          upload.total_records) *
+                        100
+                      }
+                      className="h-2 mb-2"
+                    />
                     {upload.status === 'failed' && upload.reason && (
                       <div className="mt-2 p-2 bg-red-50 border border-red-200 rounded-md">
                         <p className="text-sm text-red-800 flex items-center">